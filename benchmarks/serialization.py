@@ -0,0 +1,99 @@
+"""
+Size and speed of Address serialization compared with pickle and JSON.
+
+Run from the repository root with the package installed:
+
+    python benchmarks/serialization.py [records]
+"""
+
+import json
+import pickle
+import sys
+import timeit
+
+from smartystreets import serialization
+from smartystreets.data import AddressCollection
+
+RESULT = {
+    "input_id": "row-17",
+    "input_index": 0,
+    "candidate_index": 0,
+    "delivery_line_1": "1600 Amphitheatre Pkwy",
+    "last_line": "Mountain View CA 94043-1351",
+    "delivery_point_barcode": "940431351000",
+    "components": {
+        "primary_number": "1600",
+        "street_name": "Amphitheatre",
+        "street_suffix": "Pkwy",
+        "city_name": "Mountain View",
+        "state_abbreviation": "CA",
+        "zipcode": "94043",
+        "plus4_code": "1351",
+        "delivery_point": "00",
+        "delivery_point_check_digit": "0",
+    },
+    "metadata": {
+        "record_type": "S",
+        "zip_type": "Standard",
+        "county_fips": "06085",
+        "county_name": "Santa Clara",
+        "carrier_route": "C909",
+        "congressional_district": "18",
+        "rdi": "Commercial",
+        "elot_sequence": "0103",
+        "elot_sort": "A",
+        "latitude": 37.42357,
+        "longitude": -122.08661,
+        "precision": "Zip9",
+        "time_zone": "Pacific",
+        "utc_offset": -8,
+        "dst": True,
+    },
+    "analysis": {
+        "dpv_match_code": "Y",
+        "dpv_footnotes": "AABB",
+        "dpv_cmra": "N",
+        "dpv_vacant": "N",
+        "active": "Y",
+    },
+}
+
+
+def main(records=10000):
+    collection = AddressCollection(
+        [json.loads(json.dumps(dict(RESULT, input_index=i))) for i in range(records)]
+    )
+    formats = {
+        "pickle": (
+            lambda: pickle.dumps(collection, protocol=pickle.HIGHEST_PROTOCOL),
+            pickle.loads,
+        ),
+        "json": (
+            lambda: json.dumps(collection).encode("utf-8"),
+            lambda data: AddressCollection(json.loads(data)),
+        ),
+        "stdlib": (
+            lambda: serialization.dumps(collection, backend=serialization.STDLIB),
+            serialization.loads,
+        ),
+    }
+    if serialization.msgpack is not None:
+        formats["msgpack"] = (
+            lambda: serialization.dumps(collection, backend=serialization.MSGPACK),
+            serialization.loads,
+        )
+
+    print(f"{records} records")
+    print(f"{'format':<10}{'bytes':>12}{'encode ms':>12}{'decode ms':>12}")
+    for name, (encode, decode) in formats.items():
+        data = encode()
+        encode_time = min(timeit.repeat(encode, number=1, repeat=5))
+        decode_time = min(timeit.repeat(lambda: decode(data), number=1, repeat=5))
+        print(
+            f"{name:<10}{len(data):>12}{encode_time * 1000:>12.1f}"
+            f"{decode_time * 1000:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
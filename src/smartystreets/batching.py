@@ -0,0 +1,119 @@
+"""
+Batch packing for splitting lookups into requests the API will accept.
+
+The API limits both the number of lookups in a request and the size of the request body, and
+lookups asking for several candidates inflate the response. Packing by count alone yields some
+batches which are rejected and others which are needlessly small.
+"""
+
+import json
+
+# Documented limits of the US Street Address API
+MAX_LOOKUPS = 100
+MAX_BODY_BYTES = 32 * 1024
+
+# Request bodies are encoded compactly, so sizes can be accounted for exactly
+SEPARATORS = (",", ":")
+
+
+def encode_body(data):
+    """
+    Returns the JSON request body for data as bytes
+
+    Non-ASCII characters are escaped, so the body is ASCII and its length in bytes is the
+    length of the encoded string.
+    """
+    return json.dumps(data, separators=SEPARATORS).encode("utf-8")
+
+
+class BatchPacker:
+    """
+    Class for packing a stream of lookups into as few legal requests as possible
+    """
+
+    def __init__(
+        self,
+        max_count=MAX_LOOKUPS,
+        max_body_bytes=MAX_BODY_BYTES,
+        max_response_bytes=None,
+        candidate_bytes=1024,
+    ):
+        """
+        Constructs the packer
+
+        :param max_count: maximum number of lookups in a request
+        :param max_body_bytes: maximum size in bytes of a serialized request body
+        :param max_response_bytes: optional maximum expected response size in bytes
+        :param candidate_bytes: expected response size in bytes of each candidate address
+        :return: the configured packer
+        """
+        self.max_count = max_count
+        self.max_body_bytes = max_body_bytes
+        self.max_response_bytes = max_response_bytes
+        self.candidate_bytes = candidate_bytes
+
+    def body_size(self, lookup):
+        """
+        Returns the serialized size in bytes of a single lookup, as encoded by `encode_body`
+        """
+        return len(encode_body(lookup))
+
+    def response_size(self, lookup):
+        """
+        Returns the expected response size in bytes for a single lookup
+        """
+        return self.candidate_bytes * lookup.get("candidates", 1)
+
+    def oversized(self, lookup):
+        """
+        Returns a boolean whether a lookup exceeds the limits even in a batch of its own
+        """
+        return not self._fits(1, 2 + self.body_size(lookup), self.response_size(lookup))
+
+    def pack(self, lookups):
+        """
+        Generates lists of lookups, each within every configured limit
+
+        Batches are contiguous runs of the input so that each result's input_index can be mapped
+        back to the input. Greedily filling each batch before starting the next yields the
+        fewest contiguous batches, as all limits are additive.
+
+        A lookup which is `oversized` can't be sent at all. Rather than raising part way through
+        a stream, it is generated as a batch of its own for the caller to skip.
+
+        :param lookups: iterable of lookup dictionaries
+        :return: generator of lists of lookup dictionaries
+        """
+        batch = []
+        # An empty body is "[]" and each additional lookup adds "," between items
+        body_bytes = 2
+        response_bytes = 0
+        for lookup in lookups:
+            if self.oversized(lookup):
+                if batch:
+                    yield batch
+                yield [lookup]
+                batch, body_bytes, response_bytes = [], 2, 0
+                continue
+            lookup_body = self.body_size(lookup)
+            lookup_response = self.response_size(lookup)
+            separator = 1 if batch else 0
+            if not self._fits(
+                len(batch) + 1,
+                body_bytes + separator + lookup_body,
+                response_bytes + lookup_response,
+            ):
+                yield batch
+                batch, body_bytes, response_bytes, separator = [], 2, 0, 0
+            batch.append(lookup)
+            body_bytes += separator + lookup_body
+            response_bytes += lookup_response
+        if batch:
+            yield batch
+
+    def _fits(self, count, body_bytes, response_bytes):
+        if count > self.max_count or body_bytes > self.max_body_bytes:
+            return False
+        return (
+            self.max_response_bytes is None or response_bytes <= self.max_response_bytes
+        )
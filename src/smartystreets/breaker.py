@@ -0,0 +1,210 @@
+"""
+Circuit breaker for failing fast while the SmartyStreets API is degraded.
+
+The breaker watches a rolling window of recent calls. When too many of them fail or are slow it
+opens, and calls are rejected immediately with SmartyStreetsCircuitOpenError rather than waiting
+out the full request timeout. After a cooldown it lets a limited number of probe calls through
+(half-open) and closes again once they succeed.
+"""
+
+import collections
+import threading
+import time
+
+import httpx
+
+from smartystreets.exceptions import (
+    SmartyStreetsError,
+    SmartyStreetsServerError,
+    SmartyStreetsCircuitOpenError,
+    SmartyStreetsDeadlineError,
+)
+
+
+class CircuitBreaker:
+    """
+    Class tracking the health of the upstream API
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self,
+        failure_rate=0.5,
+        slow_call_rate=1.0,
+        slow_call_duration=None,
+        window=20,
+        minimum_calls=10,
+        cooldown=30,
+        half_open_calls=1,
+        clock=time.monotonic,
+    ):
+        """
+        Constructs the breaker
+
+        :param failure_rate: fraction of failed calls in the window which opens the breaker
+        :param slow_call_rate: fraction of slow calls in the window which opens the breaker
+        :param slow_call_duration: seconds after which a call counts as slow, or None to ignore
+                call duration
+        :param window: number of most recent calls considered
+        :param minimum_calls: number of calls required in the window before the breaker can open
+        :param cooldown: seconds the breaker stays open before allowing probe calls
+        :param half_open_calls: number of successful probes required to close the breaker
+        :param clock: callable returning the current time in seconds
+        :return: the configured breaker
+        """
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call_duration = slow_call_duration
+        self.minimum_calls = minimum_calls
+        self.cooldown = cooldown
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self.listeners = []
+        self._calls = collections.deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._probes = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """
+        Returns the current state, moving from open to half-open once the cooldown has passed
+        """
+        with self._lock:
+            transition = self._check_cooldown()
+            state = self._state
+        self._notify(transition)
+        return state
+
+    def add_listener(self, listener):
+        """
+        Registers a hook called as `listener(breaker, old_state, new_state)` on state changes
+        """
+        self.listeners.append(listener)
+
+    def is_failure(self, exc):
+        """
+        Returns a boolean whether an exception indicates an unhealthy upstream
+
+        Errors caused by the request itself (bad input, bad credentials) say nothing about the
+        health of the API, so only transport errors and server errors count, other than those
+        which are `is_neutral`.
+        """
+        if self.is_neutral(exc):
+            return False
+        if isinstance(exc, httpx.TransportError):
+            return True
+        return type(exc) in (SmartyStreetsError, SmartyStreetsServerError)
+
+    def is_neutral(self, exc):
+        """
+        Returns a boolean whether an exception ended a call without an outcome from the API
+
+        A call cut short by the caller's deadline, or which timed out waiting for a local
+        connection slot, is neither a success nor a failure and isn't recorded.
+        """
+        return isinstance(exc, (SmartyStreetsDeadlineError, httpx.PoolTimeout))
+
+    def call(self, func, *args, **kwargs):
+        """
+        Calls `func` through the breaker
+
+        :raises SmartyStreetsCircuitOpenError: if the breaker is open
+        """
+        self.before_call()
+        start = self.clock()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as exc:
+            if self.is_neutral(exc):
+                self.release()
+            else:
+                self.record(self.clock() - start, failed=self.is_failure(exc))
+            raise
+        self.record(self.clock() - start)
+        return result
+
+    def before_call(self):
+        """
+        Admits a call, or rejects it if the breaker is open or out of probe calls
+        """
+        with self._lock:
+            transition = self._check_cooldown()
+            if self._state == self.HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                admitted = True
+            else:
+                admitted = self._state == self.CLOSED
+        self._notify(transition)
+        if not admitted:
+            raise SmartyStreetsCircuitOpenError
+
+    def release(self):
+        """
+        Ends an admitted call without recording an outcome, returning its probe if half-open
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record(self, duration, failed=False):
+        """
+        Records the outcome of an admitted call
+
+        :param duration: seconds the call took
+        :param failed: boolean whether the call failed
+        """
+        slow = (
+            self.slow_call_duration is not None and duration >= self.slow_call_duration
+        )
+        with self._lock:
+            transition = None
+            if self._state == self.HALF_OPEN:
+                if failed or slow:
+                    transition = self._transition(self.OPEN)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_calls:
+                        transition = self._transition(self.CLOSED)
+            elif self._state == self.CLOSED:
+                self._calls.append((failed, slow))
+                if self._tripped():
+                    transition = self._transition(self.OPEN)
+        self._notify(transition)
+
+    def _tripped(self):
+        total = len(self._calls)
+        if total < self.minimum_calls:
+            return False
+        failures = sum(1 for failed, _ in self._calls if failed)
+        slow = sum(1 for _, slow in self._calls if slow)
+        return (
+            failures / total >= self.failure_rate or slow / total >= self.slow_call_rate
+        )
+
+    def _check_cooldown(self):
+        if self._state == self.OPEN and self.clock() - self._opened_at >= self.cooldown:
+            return self._transition(self.HALF_OPEN)
+        return None
+
+    def _transition(self, state):
+        old, self._state = self._state, state
+        self._probes = 0
+        self._probe_successes = 0
+        if state == self.OPEN:
+            self._opened_at = self.clock()
+        elif state == self.CLOSED:
+            self._calls.clear()
+        return old, state
+
+    def _notify(self, transition):
+        # Listeners are called outside the lock so they may inspect the breaker
+        if transition is None:
+            return
+        for listener in self.listeners:
+            listener(self, *transition)
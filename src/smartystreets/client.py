@@ -2,11 +2,43 @@
 Client module for connecting to and interacting with SmartyStreets API
 """
 
+import contextlib
+import time
+
 import httpx
 
-from smartystreets.data import Address, AddressCollection
+from smartystreets.batching import BatchPacker, encode_body
+from smartystreets.credentials import CredentialPool
+from smartystreets.data import Address, AddressCollection, ReverseGeoResult
 from smartystreets.decorators import validate_args, truncate_args
-from smartystreets.exceptions import SmartyStreetsError, ERROR_CODES
+from smartystreets.incremental import IncrementalJob
+from smartystreets.exceptions import (
+    SmartyStreetsError,
+    SmartyStreetsAuthError,
+    SmartyStreetsPaymentError,
+    SmartyStreetsRateLimitError,
+    SmartyStreetsServerError,
+    SmartyStreetsCircuitOpenError,
+    SmartyStreetsDeadlineError,
+    ERROR_CODES,
+)
+from smartystreets.scheduling import BULK, INTERACTIVE
+
+# Errors which are specific to the credentials used, and so worth retrying with another key
+CREDENTIAL_ERRORS = (
+    SmartyStreetsAuthError,
+    SmartyStreetsPaymentError,
+    SmartyStreetsRateLimitError,
+)
+
+# Errors which leave a batch unverified, rather than failing a bulk call given a deadline
+UPSTREAM_ERRORS = (
+    httpx.TransportError,
+    SmartyStreetsServerError,
+    SmartyStreetsRateLimitError,
+    SmartyStreetsCircuitOpenError,
+    SmartyStreetsDeadlineError,
+)
 
 
 class Client:
@@ -15,17 +47,22 @@ class Client:
     """
 
     BASE_URL = "https://api.smartystreets.com/"
+    REVERSE_GEO_URL = "https://us-reverse-geo.api.smartystreets.com/lookup"
 
     def __init__(
         self,
-        auth_id,
-        auth_token,
+        auth_id=None,
+        auth_token=None,
         standardize=False,
         invalid=False,
         logging=True,
         accept_keypair=False,
         truncate_addresses=False,
         timeout=None,
+        credentials=None,
+        circuit_breaker=None,
+        hedging=None,
+        scheduler=None,
     ):
         """
         Constructs the client
@@ -40,8 +77,23 @@ class Client:
         :param truncate_addresses: boolean to silently truncate address lists in excess of the
                 SmartyStreets maximum rather than raise an error.
         :param timeout: optional timeout value in seconds for requests.
+        :param credentials: optional CredentialPool or list of (auth_id, auth_token) pairs to
+                distribute requests across, used in place of auth_id and auth_token.
+        :param circuit_breaker: optional CircuitBreaker used to fail fast while the API is
+                degraded.
+        :param hedging: optional HedgePolicy used to duplicate slow requests for small lookups.
+        :param scheduler: optional LaneScheduler prioritizing interactive lookups over bulk
+                requests for connection slots and rate limit tokens.
         :return: the configured client object
         """
+        if credentials is None:
+            if auth_id is None or auth_token is None:
+                raise ValueError(
+                    "Either auth_id and auth_token or credentials are required"
+                )
+            credentials = [(auth_id, auth_token)]
+        if not isinstance(credentials, CredentialPool):
+            credentials = CredentialPool(credentials)
         self.auth_id = auth_id
         self.auth_token = auth_token
         self.standardize = standardize
@@ -50,17 +102,61 @@ class Client:
         self.accept_keypair = accept_keypair
         self.truncate_addresses = truncate_addresses
         self.timeout = timeout
+        self.credentials = credentials
+        self.circuit_breaker = circuit_breaker
+        self.hedging = hedging
+        self.scheduler = scheduler
         self.session = httpx.Client(base_url=self.BASE_URL)
         # self.session.mount(self.BASE_URL, requests.adapters.HTTPAdapter(max_retries=5))
 
-    def post(self, endpoint, data):
+    def post(self, endpoint, data, timeout=None, lane=INTERACTIVE, deadline_at=None):
         """
         Executes the HTTP POST request
 
+        With a deadline, the timeout of each attempt is limited to the time then remaining.
+        httpx applies a timeout to each phase of a request (connect, write, read and waiting
+        for a pooled connection) separately, so each phase gets the remaining time rather than
+        the request as a whole.
+
         :param endpoint: string indicating the URL component to call
         :param data: the data to submit
+        :param timeout: optional timeout in seconds overriding the client's timeout
+        :param lane: the scheduler lane the request waits in, if using a scheduler
+        :param deadline_at: optional `time.monotonic()` value by which the request must complete
         :return: the dumped JSON response content
+        :raises SmartyStreetsDeadlineError: if the deadline passes first
         """
+        if self.hedging is not None and self.hedging.applies(data):
+            return self.hedging.call(
+                self._attempt, endpoint, data, timeout, lane, deadline_at
+            )
+        return self._attempt(endpoint, data, timeout, lane, deadline_at)
+
+    def get(self, url, params, timeout=None, lane=INTERACTIVE):
+        """
+        Executes the HTTP GET request
+
+        :param url: the full URL to call
+        :param params: dictionary of query parameters, other than authentication
+        :param timeout: optional timeout in seconds overriding the client's timeout
+        :param lane: the scheduler lane the request waits in, if using a scheduler
+        :return: the dumped JSON response content
+        """
+        headers = {"Accept": "application/json"}
+        if self.circuit_breaker is not None:
+            return self.circuit_breaker.call(
+                self._send, "GET", url, timeout, lane, params=params, headers=headers
+            )
+        return self._send("GET", url, timeout, lane, params=params, headers=headers)
+
+    def _attempt(self, endpoint, data, timeout, lane, deadline_at):
+        if self.circuit_breaker is not None:
+            return self.circuit_breaker.call(
+                self._post, endpoint, data, timeout, lane, deadline_at
+            )
+        return self._post(endpoint, data, timeout, lane, deadline_at)
+
+    def _post(self, endpoint, data, timeout, lane, deadline_at):
         headers = {
             "Content-Type": "application/json",
             "Accept": "application/json",
@@ -71,19 +167,85 @@ class Client:
         if not self.logging:
             headers["x-suppress-logging"] = "true"
 
-        params = {"auth-id": self.auth_id, "auth-token": self.auth_token}
-        url = self.BASE_URL + endpoint
-        response = self.session.post(
-            url,
-            json=data,
-            params=params,
+        return self._send(
+            "POST",
+            self.BASE_URL + endpoint,
+            timeout,
+            lane,
+            deadline_at,
+            content=encode_body(data),
             headers=headers,
-            timeout=self.timeout,
         )
-        if response.status_code == 200:
-            return response.json()
 
-        raise ERROR_CODES.get(response.status_code, SmartyStreetsError)
+    def _send(
+        self, method, url, timeout, lane, deadline_at=None, params=None, **kwargs
+    ):
+        # A key which is throttled or out of subscription is ejected from the pool on release,
+        # so each retry here lands on the next usable key.
+        for _ in range(len(self.credentials)):
+            credential, response = self._request(
+                method, url, timeout, lane, deadline_at, params, **kwargs
+            )
+
+            if response.status_code == 200:
+                self.credentials.release(credential)
+                return response.json()
+
+            error = ERROR_CODES.get(response.status_code, SmartyStreetsError)
+            self.credentials.release(credential, error)
+            if error not in CREDENTIAL_ERRORS:
+                break
+
+        raise error
+
+    def _timeout(self, timeout, deadline_at):
+        """
+        Returns the timeout for an attempt and whether it was limited by the deadline
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if deadline_at is None:
+            return timeout, False
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise SmartyStreetsDeadlineError
+        if timeout is None or remaining < timeout:
+            return remaining, True
+        return timeout, False
+
+    def _request(self, method, url, timeout, lane, deadline_at, params, **kwargs):
+        """
+        Makes a single request with the next credential, returning the credential and response
+        """
+        attempt_timeout, capped = self._timeout(timeout, deadline_at)
+        try:
+            with self._slot(lane, attempt_timeout):
+                # The wait for a slot comes out of the time left before the deadline
+                attempt_timeout, capped = self._timeout(timeout, deadline_at)
+                credential = self.credentials.acquire()
+                try:
+                    response = self.session.request(
+                        method,
+                        url,
+                        params={**(params or {}), **credential.params},
+                        timeout=attempt_timeout,
+                        **kwargs,
+                    )
+                except Exception:
+                    self.credentials.release(credential)
+                    raise
+        except httpx.TimeoutException as exc:
+            # Cut short by the caller's budget rather than a sign the API is unhealthy
+            if capped:
+                raise SmartyStreetsDeadlineError from exc
+            raise
+        return credential, response
+
+    def _slot(self, lane, timeout):
+        # Waiting for a slot counts against the request's timeout, as waiting for a pooled
+        # connection does in httpx
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        return self.scheduler.slot(lane, timeout)
 
     @truncate_args
     @validate_args
@@ -107,10 +269,107 @@ class Client:
         # While it's okay in theory to accept freeform addresses they do need to be submitted in
         # a dictionary format.
         if not isinstance(addresses[0], dict):
-            addresses = [{"street": arg for arg in addresses}]
+            addresses = [{"street": arg} for arg in addresses]
 
         return AddressCollection(self.post("street-address", data=addresses))
 
+    def bulk_street_addresses(self, addresses, packer=None, deadline=None, store=None):
+        """
+        API method for verifying any number of street addresses
+
+        The addresses are packed into as few requests as the API limits allow and the results
+        combined into a single AddressCollection, with each result's input_index adjusted to
+        match the position of its address in the full input.
+
+        With a deadline, each request's timeout is limited to the time remaining and no further
+        requests are made once the remaining time is less than the slowest request so far.
+        Rather than raising on a timeout or an upstream error, such as a server error or an open
+        circuit breaker, the partial results are returned with the input indexes of the
+        addresses which weren't verified listed in the collection's `unverified` attribute.
+        Addresses too large to be sent within the packer's limits are always listed there.
+
+        >>> client.bulk_street_addresses(row["address"] for row in rows)
+        >>> client.bulk_street_addresses(addresses, deadline=0.3).unverified
+
+        For jobs too large to hold in memory, pass a writable ResultStore: each batch's results
+        are appended to it as they arrive and the store is returned in place of the collection.
+
+        :param addresses: iterable of addresses in string or dict format
+        :param packer: optional BatchPacker configuring the request limits
+        :param deadline: optional time budget in seconds for the whole call
+        :param store: optional ResultStore open for writing to collect results on disk
+        :return: an AddressCollection, or the store if one was given
+        """
+        packer = packer or BatchPacker()
+        lookups = (
+            address if isinstance(address, dict) else {"street": address}
+            for address in addresses
+        )
+        deadline_at = None if deadline is None else time.monotonic() + deadline
+        results = [] if store is None else store
+        unverified = []
+        offset = 0
+        slowest = 0.0
+        for batch in packer.pack(lookups):
+            indexes = range(offset, offset + len(batch))
+            offset += len(batch)
+            if self._skip_batch(packer, batch, deadline_at, slowest):
+                unverified.extend(indexes)
+                continue
+
+            start = time.monotonic()
+            try:
+                response = self.post(
+                    "street-address", data=batch, lane=BULK, deadline_at=deadline_at
+                )
+            except UPSTREAM_ERRORS:
+                if deadline is None:
+                    raise
+                unverified.extend(indexes)
+                continue
+            slowest = max(slowest, time.monotonic() - start)
+
+            for address in AddressCollection(response):
+                if address.index is not None:
+                    address["input_index"] += indexes.start
+                results.append(address)
+
+        if store is not None:
+            store.flush()
+            store.unverified = unverified
+            return store
+        return AddressCollection(results, unverified=unverified)
+
+    def _skip_batch(self, packer, batch, deadline_at, slowest):
+        """
+        Returns a boolean whether a batch can't be sent, or can't complete within the deadline
+        """
+        if len(batch) == 1 and packer.oversized(batch[0]):
+            return True
+        return deadline_at is not None and deadline_at - time.monotonic() <= slowest
+
+    def reverify(self, addresses, store, max_age=None, packer=None):
+        """
+        API method for re-verifying a snapshot of rows, sending only what has changed
+
+        Rows are compared against the fingerprints held in `store`. Only rows which are new,
+        whose lookup or the client options have changed, or whose results are older than
+        `max_age` are sent to the API; the rest are served from the store. The input indexes
+        of rows which couldn't be sent are listed in the collection's `unverified` attribute,
+        and any earlier results stored for them are returned.
+
+        >>> client.reverify(rows, SQLiteFingerprintStore("fingerprints.db"), max_age=90 * 86400)
+
+        :param addresses: iterable of lookup dictionaries, each with an input_id
+        :param store: a FingerprintStore
+        :param max_age: optional seconds after which stored results are re-verified
+        :param packer: optional BatchPacker configuring the request limits
+        :return: an AddressCollection with results for every row
+        """
+        job = IncrementalJob(self, store, max_age=max_age, packer=packer)
+        results = list(job.run(addresses))
+        return AddressCollection(results, unverified=job.unverified)
+
     def street_address(self, address):
         """
         Geocode one and only address, get a single Address object back
@@ -127,5 +386,23 @@ class Client:
 
         return Address(address[0])
 
+    def reverse_geocode(self, latitude, longitude):
+        """
+        API method for finding the addresses nearest to a point
+
+        Results are ordered by distance from the point. See ReverseGeocoder for caching results
+        of nearby points.
+
+        >>> client.reverse_geocode(40.111111, -111.111111)
+
+        :param latitude: latitude in decimal degrees
+        :param longitude: longitude in decimal degrees
+        :return: a list of ReverseGeoResult objects
+        """
+        response = self.get(
+            self.REVERSE_GEO_URL, params={"latitude": latitude, "longitude": longitude}
+        )
+        return [ReverseGeoResult(result) for result in response.get("results", [])]
+
     def zipcode(self, *args):
         raise NotImplementedError("You cannot lookup zipcodes yet")
@@ -0,0 +1,152 @@
+"""
+Credential pooling for spreading requests across multiple SmartyStreets keys.
+
+Each key carries its own rate limit and subscription, so a pool of keys lets a single client
+exceed the throughput of any one of them. Keys which are throttled or which fail with an
+authentication or payment error are temporarily ejected from the rotation.
+"""
+
+import threading
+import time
+
+from smartystreets.exceptions import (
+    SmartyStreetsAuthError,
+    SmartyStreetsPaymentError,
+    SmartyStreetsRateLimitError,
+)
+
+
+class Credential:
+    """
+    A single auth ID/token pair along with its usage counters
+    """
+
+    def __init__(self, auth_id, auth_token):
+        self.auth_id = auth_id
+        self.auth_token = auth_token
+        self.requests = 0
+        self.in_flight = 0
+        self.throttled = 0
+        self.failures = 0
+        self.ejected_until = None
+
+    @property
+    def params(self):
+        """
+        Returns the query parameters used to authenticate a request with this key
+        """
+        return {"auth-id": self.auth_id, "auth-token": self.auth_token}
+
+    def available(self, now):
+        """
+        Returns a boolean whether this key is currently in the rotation
+        """
+        return self.ejected_until is None or self.ejected_until <= now
+
+    def usage(self, now):
+        """
+        Returns a dictionary of the usage counters for this key
+        """
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "ejected": not self.available(now),
+        }
+
+
+class CredentialPool:
+    """
+    Class for distributing requests across one or more credentials
+    """
+
+    ROUND_ROBIN = "round-robin"
+    LEAST_LOADED = "least-loaded"
+
+    def __init__(
+        self,
+        credentials,
+        strategy=ROUND_ROBIN,
+        eject_for=300,
+        throttle_for=60,
+        clock=time.monotonic,
+    ):
+        """
+        Constructs the pool
+
+        :param credentials: iterable of (auth_id, auth_token) pairs or Credential objects
+        :param strategy: either CredentialPool.ROUND_ROBIN or CredentialPool.LEAST_LOADED
+        :param eject_for: seconds to remove a key from rotation after an auth or payment error
+        :param throttle_for: seconds to remove a key from rotation after it was rate limited
+        :param clock: callable returning the current time in seconds
+        :return: the configured pool
+        """
+        self.credentials = [
+            c if isinstance(c, Credential) else Credential(*c) for c in credentials
+        ]
+        if not self.credentials:
+            raise ValueError("At least one credential is required")
+        if strategy not in (self.ROUND_ROBIN, self.LEAST_LOADED):
+            raise ValueError(f"Unknown credential strategy {strategy!r}")
+        self.strategy = strategy
+        self.eject_for = eject_for
+        self.throttle_for = throttle_for
+        self.clock = clock
+        self._cursor = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.credentials)
+
+    def acquire(self):
+        """
+        Selects the credential to use for the next request
+
+        When every key has been ejected the key which will recover soonest is used rather than
+        failing outright, so that the API's own error is what surfaces to the caller.
+
+        :return: a Credential
+        """
+        with self._lock:
+            now = self.clock()
+            available = [c for c in self.credentials if c.available(now)]
+            if not available:
+                credential = min(self.credentials, key=lambda c: c.ejected_until)
+            elif self.strategy == self.LEAST_LOADED:
+                credential = min(available, key=lambda c: (c.in_flight, c.requests))
+            else:
+                count = len(self.credentials)
+                for offset in range(count):
+                    candidate = self.credentials[(self._cursor + offset) % count]
+                    if candidate.available(now):
+                        break
+                self._cursor = (self.credentials.index(candidate) + 1) % count
+                credential = candidate
+            credential.requests += 1
+            credential.in_flight += 1
+            return credential
+
+    def release(self, credential, error=None):
+        """
+        Returns a credential to the pool, recording the outcome of its request
+
+        :param credential: the Credential returned from `acquire`
+        :param error: the SmartyStreetsError class raised by the request, if any
+        """
+        with self._lock:
+            credential.in_flight -= 1
+            if error is SmartyStreetsRateLimitError:
+                credential.throttled += 1
+                credential.ejected_until = self.clock() + self.throttle_for
+            elif error in (SmartyStreetsAuthError, SmartyStreetsPaymentError):
+                credential.failures += 1
+                credential.ejected_until = self.clock() + self.eject_for
+
+    def usage(self):
+        """
+        Returns the usage counters for every key in the pool, keyed by auth ID
+        """
+        with self._lock:
+            now = self.clock()
+            return {c.auth_id: c.usage(now) for c in self.credentials}
@@ -66,16 +66,18 @@ class AddressCollection(list):
     Class for handling multiple responses.
     """
 
-    id_lookup = {}  # For user supplied input_id
-    index_lookup = {}  # For SmartyStreets input_index
-
-    def __init__(self, results):
+    def __init__(self, results, unverified=None):
         """
         Constructor for an AddressCollection
 
         :param addresses: a list of dictionaries providing address information
+        :param unverified: optional list of input indexes which were not submitted for
+                verification, e.g. because a deadline passed
         :return:
         """
+        self.unverified = unverified or []
+        self.id_lookup = {}  # For user supplied input_id
+        self.index_lookup = {}  # For SmartyStreets input_index
         addresses = []
         for index, result in enumerate(results):
             address = Address(result)
@@ -111,3 +113,33 @@ class AddressCollection(list):
 
         except TypeError:
             raise KeyError
+
+
+class ReverseGeoResult(dict):
+    """
+    Class for handling a single reverse geocoding result
+    """
+
+    @property
+    def address(self):
+        """
+        Returns the address dictionary
+        """
+        return self.get("address", {})
+
+    @property
+    def distance(self):
+        """
+        Returns the distance in meters from the point looked up
+        """
+        return self.get("distance")
+
+    @property
+    def location(self):
+        """
+        Returns the geolocation of the address as a lat/lng pair
+        """
+        try:
+            return self["coordinate"]["latitude"], self["coordinate"]["longitude"]
+        except KeyError:
+            return None
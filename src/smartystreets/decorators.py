@@ -1,5 +1,7 @@
 """Data validation decorators."""
 
+from smartystreets.batching import MAX_LOOKUPS
+
 
 def validate_args(f):
     """
@@ -31,12 +33,12 @@ def truncate_args(f):
     """
 
     def wrapper(self, args):
-        if len(args) > 100:
+        if len(args) > MAX_LOOKUPS:
             if self.truncate_addresses:
-                args = args[:100]
+                args = args[:MAX_LOOKUPS]
             else:
                 raise ValueError(
-                    "This exceeds 100 address at a time SmartyStreets limit"
+                    f"This exceeds {MAX_LOOKUPS} address at a time SmartyStreets limit"
                 )
 
         return f(self, args)
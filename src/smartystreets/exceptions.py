@@ -22,13 +22,31 @@ class SmartyStreetsPaymentError(SmartyStreetsError):
     """HTTP 402 Payment required. No active subscription found."""
 
 
+class SmartyStreetsRequestTooLargeError(SmartyStreetsError):
+    """HTTP 413 Request entity too large. The request body exceeds the maximum size."""
+
+
+class SmartyStreetsRateLimitError(SmartyStreetsError):
+    """HTTP 429 Too many requests. Rate limit exceeded for these credentials."""
+
+
 class SmartyStreetsServerError(SmartyStreetsError):
     """HTTP 500 Internal server error. General service failure; retry request."""
 
 
+class SmartyStreetsCircuitOpenError(SmartyStreetsError):
+    """Circuit breaker open. Failing fast until the SmartyStreets API recovers."""
+
+
+class SmartyStreetsDeadlineError(SmartyStreetsError):
+    """Deadline exceeded. The request was cut short by the caller's time budget."""
+
+
 ERROR_CODES = {
     400: SmartyStreetsInputError,
     401: SmartyStreetsAuthError,
     402: SmartyStreetsPaymentError,
+    413: SmartyStreetsRequestTooLargeError,
+    429: SmartyStreetsRateLimitError,
     500: SmartyStreetsServerError,
 }
@@ -0,0 +1,196 @@
+"""
+Cached reverse geocoding.
+
+Points looked up from devices are often repeated with small variations: the same building, or
+the same spot with GPS jitter. Points are quantized to a geohash cell and the nearest addresses are
+looked up once per cell, from the cell's center, so any point falling in a cached cell is served
+locally. Concurrent lookups for the same cell share a single request.
+"""
+
+import collections
+import concurrent.futures
+import threading
+import time
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(latitude, longitude, precision=8):
+    """
+    Returns the geohash of a point
+
+    Each character narrows the cell; at precision 8 a cell is about 38m by 19m, at precision 9
+    about 5m by 5m.
+
+    :param latitude: latitude in decimal degrees
+    :param longitude: longitude in decimal degrees
+    :param precision: number of characters in the geohash
+    :return: the geohash string
+    """
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        coordinate, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        if coordinate >= middle:
+            value = value << 1 | 1
+            bounds[0] = middle
+        else:
+            value <<= 1
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def geohash_center(cell):
+    """
+    Returns the center of a geohash cell as a lat/lng pair
+    """
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        value = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bounds = lng_range if even else lat_range
+            middle = (bounds[0] + bounds[1]) / 2
+            if value >> shift & 1:
+                bounds[0] = middle
+            else:
+                bounds[1] = middle
+            even = not even
+    return sum(lat_range) / 2, sum(lng_range) / 2
+
+
+class ReverseGeocoder:
+    """
+    Class for reverse geocoding through a cache of geohash cells
+    """
+
+    def __init__(
+        self,
+        client,
+        precision=8,
+        max_size=10000,
+        ttl=None,
+        max_workers=4,
+        clock=time.monotonic,
+    ):
+        """
+        Constructs the geocoder
+
+        :param client: the Client used for lookups
+        :param precision: geohash precision points are quantized to
+        :param max_size: maximum number of cells cached, least recently used first out
+        :param ttl: optional seconds a cached cell is served for
+        :param max_workers: number of concurrent lookups made by `lookup_many`
+        :param clock: callable returning the current time in seconds
+        :return: the configured geocoder
+        """
+        self.client = client
+        self.precision = precision
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._cache = collections.OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, latitude, longitude):
+        """
+        Returns the addresses nearest to the center of the point's cell
+
+        Distances in the results are from the cell center rather than the point itself.
+
+        :param latitude: latitude in decimal degrees
+        :param longitude: longitude in decimal degrees
+        :return: a list of ReverseGeoResult objects
+        """
+        cell = geohash(latitude, longitude, self.precision)
+        with self._lock:
+            cached = self._cache.get(cell)
+            if cached is not None and (
+                self.ttl is None or self.clock() - cached[0] < self.ttl
+            ):
+                self._cache.move_to_end(cell)
+                self.hits += 1
+                return cached[1]
+
+            future = self._in_flight.get(cell)
+            if future is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                future = concurrent.futures.Future()
+                self._in_flight[cell] = future
+                self.misses += 1
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        # Lookups waiting on the future must be released however this one ends, including by
+        # KeyboardInterrupt, or they would block forever
+        try:
+            results = self.client.reverse_geocode(*geohash_center(cell))
+            with self._lock:
+                del self._in_flight[cell]
+                self._cache[cell] = (self.clock(), results)
+                self._cache.move_to_end(cell)
+                while len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(cell, None)
+        future.set_result(results)
+        return results
+
+    def lookup_many(self, points):
+        """
+        Returns the nearest addresses for each of a list of points
+
+        Points are grouped by cell so that each uncached cell is looked up once, with up to
+        `max_workers` lookups made concurrently.
+
+        :param points: iterable of lat/lng pairs
+        :return: a list of result lists, one for each point in order
+        """
+        points = list(points)
+        cells = {}
+        for latitude, longitude in points:
+            cells.setdefault(
+                geohash(latitude, longitude, self.precision), (latitude, longitude)
+            )
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            found = dict(
+                zip(
+                    cells,
+                    executor.map(lambda point: self.lookup(*point), cells.values()),
+                )
+            )
+        return [found[geohash(lat, lng, self.precision)] for lat, lng in points]
+
+    def stats(self):
+        """
+        Returns the cache hit, miss and coalesced lookup counts and the number of cached cells
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "cached": len(self._cache),
+            }
@@ -0,0 +1,180 @@
+"""
+Request hedging for cutting tail latency on small, interactive lookups.
+
+If a request hasn't completed within a delay derived from a percentile of recently observed
+latencies, a duplicate request is issued and whichever response arrives first is used. The extra
+traffic is capped by a budget expressed as a fraction of all hedged-eligible requests.
+
+Requests are only hedged while the policy has idle worker threads. Once every worker is busy a
+request runs on the caller's thread without a hedge, as a request waiting for a worker would
+pass the hedging delay before it had even started, and so would its hedge.
+"""
+
+import collections
+import concurrent.futures
+import threading
+import time
+
+
+class HedgePolicy:
+    """
+    Class configuring and executing hedged requests
+    """
+
+    def __init__(
+        self,
+        percentile=0.95,
+        initial_delay=0.2,
+        min_delay=0.01,
+        max_delay=2.0,
+        budget=0.1,
+        max_batch_size=10,
+        sample_size=500,
+        min_samples=20,
+        max_workers=16,
+        clock=time.monotonic,
+    ):
+        """
+        Constructs the policy
+
+        :param percentile: latency percentile, between 0 and 1, after which a request is hedged
+        :param initial_delay: seconds to wait before hedging until enough latencies are observed
+        :param min_delay: lower bound in seconds on the hedging delay
+        :param max_delay: upper bound in seconds on the hedging delay
+        :param budget: maximum ratio of hedge requests to eligible requests
+        :param max_batch_size: largest number of lookups in a request which may be hedged
+        :param sample_size: number of recent latencies the percentile is computed from
+        :param min_samples: number of latencies required before the percentile is used
+        :param max_workers: number of threads available for hedged requests and their hedges
+        :param clock: callable returning the current time in seconds
+        :return: the configured policy
+        """
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.max_batch_size = max_batch_size
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+        self.clock = clock
+        self.requests = 0
+        self.hedges = 0
+        self.wins = 0
+        self._latencies = collections.deque(maxlen=sample_size)
+        self._executor = None
+        self._idle = threading.Semaphore(max_workers)
+        self._lock = threading.Lock()
+
+    def applies(self, data):
+        """
+        Returns a boolean whether a request for these lookups may be hedged
+        """
+        return len(data) <= self.max_batch_size
+
+    @property
+    def delay(self):
+        """
+        Returns the seconds to wait on a request before issuing a hedge
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            latencies = sorted(self._latencies)
+        position = min(int(len(latencies) * self.percentile), len(latencies) - 1)
+        return min(max(latencies[position], self.min_delay), self.max_delay)
+
+    def stats(self):
+        """
+        Returns the request, hedge and hedge win counts and rates
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "wins": self.wins,
+                "hedge_rate": self.hedges / self.requests if self.requests else 0.0,
+                "win_rate": self.wins / self.hedges if self.hedges else 0.0,
+            }
+
+    def call(self, func, *args, **kwargs):
+        """
+        Calls `func`, hedging with a duplicate call if the first is slow
+
+        The first call to complete successfully provides the result. A request already in flight
+        can't be interrupted, so the other call's response is simply discarded. If both calls
+        fail the primary call's error is raised.
+
+        The hedging delay is timed from when the first call starts. If no worker is idle the
+        call is made on the caller's thread without a hedge.
+        """
+        with self._lock:
+            self.requests += 1
+        if not self._idle.acquire(blocking=False):
+            return self._timed(func, args, kwargs)
+
+        started = threading.Event()
+        primary = self._submit(started, func, args, kwargs)
+        started.wait()
+        try:
+            return primary.result(timeout=self.delay)
+        except concurrent.futures.TimeoutError:
+            pass
+
+        if not self._idle.acquire(blocking=False):
+            return primary.result()
+        if not self._take_hedge():
+            self._idle.release()
+            return primary.result()
+
+        hedge = self._submit(threading.Event(), func, args, kwargs)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.wins += 1
+                    return future.result()
+
+        return primary.result()
+
+    def _submit(self, started, func, args, kwargs):
+        """
+        Runs a call on a worker which has already been reserved from the idle workers
+        """
+
+        def run():
+            started.set()
+            try:
+                return self._timed(func, args, kwargs)
+            finally:
+                self._idle.release()
+
+        return self._get_executor().submit(run)
+
+    def _timed(self, func, args, kwargs):
+        start = self.clock()
+        result = func(*args, **kwargs)
+        with self._lock:
+            self._latencies.append(self.clock() - start)
+        return result
+
+    def _take_hedge(self):
+        with self._lock:
+            if self.hedges >= self.budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="smartystreets-hedge",
+                )
+            return self._executor
@@ -0,0 +1,241 @@
+"""
+Incremental re-verification of address tables.
+
+Re-verifying a large table in full is wasteful when only a small share of rows have changed.
+A fingerprint store remembers a hash of each row's lookup along with when it was last verified
+and its results, so that a job only needs to send rows which are new, changed or stale.
+"""
+
+import hashlib
+import itertools
+import json
+import sqlite3
+import time
+
+from smartystreets.data import Address
+
+# Client options which change the results returned for the same lookup
+FINGERPRINT_OPTIONS = ("standardize", "invalid", "accept_keypair")
+
+
+def fingerprint(lookup, options=None):
+    """
+    Returns a hash of a lookup, insensitive to case, whitespace and key order
+
+    The input_id is excluded as it identifies the row rather than the address.
+
+    :param lookup: a lookup dictionary
+    :param options: optional dictionary of client options affecting the results
+    :return: a hex digest string
+    """
+    normalized = {
+        key: " ".join(str(value).lower().split())
+        for key, value in lookup.items()
+        if key != "input_id" and value not in (None, "")
+    }
+    payload = json.dumps([normalized, options or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class FingerprintStore:
+    """
+    Base class for storing fingerprints, verification times and results by row key
+    """
+
+    def get_many(self, keys):
+        """
+        Returns a dictionary mapping each stored key, as a string, to a (fingerprint,
+        verified_at, results) tuple, omitting keys which have not been stored
+        """
+        raise NotImplementedError
+
+    def update(self, records):
+        """
+        Stores (key, fingerprint, verified_at, results) records, replacing existing ones
+        """
+        raise NotImplementedError
+
+
+class MemoryFingerprintStore(FingerprintStore):
+    """
+    Fingerprint store held in a dictionary
+    """
+
+    def __init__(self):
+        self.records = {}
+
+    def get_many(self, keys):
+        keys = (str(key) for key in keys)
+        return {key: self.records[key] for key in keys if key in self.records}
+
+    def update(self, records):
+        for key, digest, verified_at, results in records:
+            self.records[str(key)] = (digest, verified_at, results)
+
+
+class SQLiteFingerprintStore(FingerprintStore):
+    """
+    Fingerprint store persisted to an SQLite database
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT, verified_at REAL, results TEXT)"
+        )
+
+    def get_many(self, keys):
+        keys = [str(key) for key in keys]
+        found = {}
+        # Stay well under SQLite's limit on the number of query parameters
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            rows = self.connection.execute(
+                "SELECT key, fingerprint, verified_at, results FROM fingerprints "
+                "WHERE key IN ({})".format(",".join("?" * len(chunk))),
+                chunk,
+            )
+            for key, digest, verified_at, results in rows:
+                found[key] = (digest, verified_at, json.loads(results))
+        return found
+
+    def update(self, records):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?)",
+                (
+                    (str(key), digest, verified_at, json.dumps(results))
+                    for key, digest, verified_at, results in records
+                ),
+            )
+
+    def close(self):
+        self.connection.close()
+
+
+class IncrementalJob:
+    """
+    Class for re-verifying only the rows of a snapshot which are new, changed or stale
+    """
+
+    def __init__(
+        self,
+        client,
+        store,
+        max_age=None,
+        packer=None,
+        chunk_size=10000,
+        clock=time.time,
+    ):
+        """
+        Constructs the job
+
+        :param client: the Client used to verify rows
+        :param store: a FingerprintStore
+        :param max_age: optional seconds after which a row's results are stale
+        :param packer: optional BatchPacker passed to bulk_street_addresses
+        :param chunk_size: number of rows compared against the store at a time
+        :param clock: callable returning the current time in seconds since the epoch
+        :return: the configured job
+        """
+        self.client = client
+        self.store = store
+        self.max_age = max_age
+        self.packer = packer
+        self.chunk_size = chunk_size
+        self.clock = clock
+        self.options = {
+            option: getattr(client, option) for option in FINGERPRINT_OPTIONS
+        }
+        self.counts = {"new": 0, "changed": 0, "stale": 0, "unchanged": 0}
+        self.unverified = []
+
+    def run(self, addresses):
+        """
+        Generates results for every row of the snapshot in input order
+
+        Each row must carry an `input_id` identifying it between snapshots. Rows needing
+        verification are sent to the API and stored; the rest are served from the store. The
+        input_index of every result matches the row's position in the snapshot.
+
+        Rows which needed verification but couldn't be sent are listed by position in the
+        `unverified` attribute. Any results stored for them from an earlier job are served,
+        as for unchanged rows, so that they aren't mistaken for rows without a match.
+
+        :param addresses: iterable of lookup dictionaries
+        :return: generator of Address objects
+        """
+        self.unverified = []
+        addresses = iter(addresses)
+        for offset in itertools.count(step=self.chunk_size):
+            chunk = list(itertools.islice(addresses, self.chunk_size))
+            if not chunk:
+                break
+            yield from self._run_chunk(offset, chunk)
+
+    def _run_chunk(self, offset, chunk):
+        now = self.clock()
+        if any("input_id" not in lookup for lookup in chunk):
+            raise ValueError("Every row requires an input_id to be re-verified")
+        digests = [fingerprint(lookup, self.options) for lookup in chunk]
+        stored = self.store.get_many([lookup["input_id"] for lookup in chunk])
+        pending = self._classify(chunk, digests, stored, now)
+        fresh = self._verify(offset, chunk, digests, pending, now) if pending else {}
+        return self._merge(offset, chunk, stored, fresh)
+
+    def _classify(self, chunk, digests, stored, now):
+        """
+        Counts each row as new, changed, stale or unchanged, returning the positions of rows
+        needing verification
+        """
+        pending = []
+        for position, (lookup, digest) in enumerate(zip(chunk, digests)):
+            record = stored.get(str(lookup["input_id"]))
+            if record is None:
+                status = "new"
+            elif record[0] != digest:
+                status = "changed"
+            elif self.max_age is not None and now - record[1] > self.max_age:
+                status = "stale"
+            else:
+                status = "unchanged"
+            self.counts[status] += 1
+            if status != "unchanged":
+                pending.append(position)
+        return pending
+
+    def _verify(self, offset, chunk, digests, pending, now):
+        """
+        Verifies the pending rows and stores their results, returning the results by position
+        of the rows which were verified
+        """
+        fresh = {position: [] for position in pending}
+        verified = self.client.bulk_street_addresses(
+            [chunk[position] for position in pending], packer=self.packer
+        )
+        for address in verified:
+            result = dict(address)
+            result.pop("input_index")
+            fresh[pending[address.index]].append(result)
+        # Rows which couldn't be sent have no results, and are left to be served from the store
+        for index in verified.unverified:
+            del fresh[pending[index]]
+            self.unverified.append(offset + pending[index])
+        self.store.update(
+            (chunk[position]["input_id"], digests[position], now, results)
+            for position, results in fresh.items()
+        )
+        return fresh
+
+    def _merge(self, offset, chunk, stored, fresh):
+        """
+        Generates the results of every row in order, from fresh results or the store
+        """
+        for position, lookup in enumerate(chunk):
+            if position in fresh:
+                results = fresh[position]
+            else:
+                results = stored.get(str(lookup["input_id"]), (None, None, []))[2]
+            for result in results:
+                yield Address(result, input_index=offset + position)
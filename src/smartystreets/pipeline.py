@@ -0,0 +1,130 @@
+"""
+Process pool pipeline for spreading large jobs across CPU cores.
+
+For multi-million row jobs decoding responses, constructing Address objects and applying
+transforms is CPU bound and limited to one core by the GIL. The pipeline shards the input across
+a pool of worker processes, each with its own Client and connection pool, and streams the
+results back in input order.
+"""
+
+import concurrent.futures
+import collections
+import itertools
+import os
+
+from smartystreets.client import Client
+from smartystreets.data import AddressCollection
+from smartystreets.serialization import dumps, loads
+
+# The client owned by a worker process, created once by the pool initializer
+_client = None
+
+
+def _init_worker(client_factory, client_options):
+    global _client
+    _client = client_factory(**client_options)
+
+
+def _verify_shard(offset, lookups, transform):
+    """
+    Verifies one shard in a worker process, returning its results in compact serialized form
+    """
+    verified = _client.bulk_street_addresses(lookups)
+    records = []
+    for address in verified:
+        if address.index is not None:
+            address["input_index"] += offset
+        if transform is not None:
+            address = transform(address)
+        records.append(address)
+    unverified = [offset + index for index in verified.unverified]
+    return dumps(AddressCollection(records, unverified=unverified))
+
+
+class Pipeline:
+    """
+    Class for verifying addresses across a pool of worker processes
+    """
+
+    def __init__(
+        self,
+        client_options,
+        processes=None,
+        shard_size=1000,
+        max_pending=None,
+        transform=None,
+        client_factory=Client,
+        mp_context=None,
+    ):
+        """
+        Constructs the pipeline
+
+        Clients can't be shared between processes, so each worker builds its own by calling
+        `client_factory(**client_options)`. The factory and transform must be picklable, i.e.
+        defined at module level.
+
+        :param client_options: dictionary of keyword arguments for the client, e.g. auth_id
+        :param processes: number of worker processes, defaulting to the number of CPUs
+        :param shard_size: number of addresses sent to a worker at a time
+        :param max_pending: maximum number of shards queued or in progress, defaulting to
+                twice the number of processes
+        :param transform: optional callable applied to each Address in the worker process
+        :param client_factory: callable returning a client, defaulting to Client
+        :param mp_context: optional multiprocessing context for the process pool
+        :return: the configured pipeline
+        """
+        self.client_options = client_options
+        self.processes = processes
+        self.shard_size = shard_size
+        self.max_pending = max_pending
+        self.transform = transform
+        self.client_factory = client_factory
+        self.mp_context = mp_context
+        self.unverified = []
+
+    def run(self, addresses):
+        """
+        Generates the verified Address results in input order
+
+        Shards are verified concurrently, but results are yielded shard by shard in the order
+        they were submitted so that input_index values come back in order. At most
+        `max_pending` shards of results are held at any one time. The input indexes of
+        addresses which couldn't be verified are collected in the `unverified` attribute.
+
+        :param addresses: iterable of addresses in string or dict format
+        :return: generator of Address objects with input_index matching the full input
+        """
+        processes = self.processes or os.cpu_count() or 1
+        max_pending = self.max_pending or 2 * processes
+        self.unverified = []
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=self.mp_context,
+            initializer=_init_worker,
+            initargs=(self.client_factory, self.client_options),
+        ) as executor:
+            pending = collections.deque()
+            addresses = iter(addresses)
+            for offset in itertools.count(step=self.shard_size):
+                shard = list(itertools.islice(addresses, self.shard_size))
+                if not shard:
+                    break
+                pending.append(
+                    executor.submit(_verify_shard, offset, shard, self.transform)
+                )
+                if len(pending) >= max_pending:
+                    yield from self._load_shard(pending.popleft().result())
+            while pending:
+                yield from self._load_shard(pending.popleft().result())
+
+    def collect(self, addresses):
+        """
+        Verifies all addresses and returns the results as a single AddressCollection
+        """
+        results = list(self.run(addresses))
+        return AddressCollection(results, unverified=self.unverified)
+
+    def _load_shard(self, payload):
+        shard = loads(payload)
+        self.unverified.extend(shard.unverified)
+        return shard
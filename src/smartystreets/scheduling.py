@@ -0,0 +1,198 @@
+"""
+Priority lanes for sharing one client between interactive lookups and bulk jobs.
+
+Requests wait in a per-lane queue for a connection slot and, optionally, a rate limit token.
+Whenever a slot frees up the scheduler picks the next lane by weighted fair sharing (stride
+scheduling), so a backlog of queued bulk batches can't hold up an interactive lookup which
+arrives after them, while bulk work still gets its weighted share. A number of slots can be
+reserved for the interactive lane alone.
+"""
+
+import collections
+import contextlib
+import threading
+import time
+
+import httpx
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+
+class Lane:
+    """
+    A queue of waiting requests along with its metrics
+    """
+
+    def __init__(self, name, weight):
+        self.name = name
+        self.weight = weight
+        self.waiting = collections.deque()
+        self.position = 0.0  # Virtual time of the lane's next grant
+        self.max_depth = 0
+        self.granted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def stats(self):
+        """
+        Returns a dictionary of the queue depth and wait time metrics for this lane
+        """
+        return {
+            "depth": len(self.waiting),
+            "max_depth": self.max_depth,
+            "granted": self.granted,
+            "mean_wait": self.total_wait / self.granted if self.granted else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+
+class LaneScheduler:
+    """
+    Class for admitting requests from prioritized lanes to a limited number of slots
+    """
+
+    def __init__(
+        self,
+        slots=10,
+        weights=None,
+        reserved=1,
+        rate=None,
+        burst=None,
+        clock=time.monotonic,
+    ):
+        """
+        Constructs the scheduler
+
+        :param slots: number of requests allowed in flight at once
+        :param weights: optional dictionary of lane name to weight, merged over the default
+                of an interactive lane with eight times the share of a bulk lane
+        :param reserved: number of slots only the interactive lane may use
+        :param rate: optional maximum requests per second
+        :param burst: maximum number of requests which may be made at once under the rate
+                limit, defaulting to the number of slots
+        :param clock: callable returning the current time in seconds
+        :return: the configured scheduler
+        """
+        weights = {INTERACTIVE: 8, BULK: 1, **(weights or {})}
+        if reserved >= slots:
+            raise ValueError("At least one slot must be available to every lane")
+        self.lanes = {name: Lane(name, weight) for name, weight in weights.items()}
+        self.slots = slots
+        self.reserved = reserved
+        self.rate = rate
+        self.burst = burst or slots
+        self.clock = clock
+        self.in_use = 0
+        self._tokens = self.burst
+        self._refilled_at = clock()
+        self._virtual_time = 0.0
+        self._condition = threading.Condition()
+
+    @contextlib.contextmanager
+    def slot(self, lane=INTERACTIVE, timeout=None):
+        """
+        Context manager holding a slot for the duration of a request
+        """
+        self.acquire(lane, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, lane=INTERACTIVE, timeout=None):
+        """
+        Blocks until a request in the given lane may be made
+
+        :param lane: the name of the lane
+        :param timeout: optional maximum seconds to wait
+        :raises httpx.PoolTimeout: if the request isn't admitted within the timeout
+        """
+        try:
+            lane = self.lanes[lane]
+        except KeyError:
+            raise ValueError(f"Unknown lane {lane!r}")
+
+        with self._condition:
+            enqueued = self.clock()
+            # A lane which was idle can't claim the share it didn't use while idle
+            if not lane.waiting:
+                lane.position = max(lane.position, self._virtual_time)
+            ticket = object()
+            lane.waiting.append(ticket)
+            lane.max_depth = max(lane.max_depth, len(lane.waiting))
+
+            while True:
+                wait = self._try_grant(lane, ticket)
+                if wait == 0:
+                    break
+                if timeout is not None:
+                    remaining = enqueued + timeout - self.clock()
+                    if remaining <= 0:
+                        self._abandon(lane, ticket)
+                        raise httpx.PoolTimeout(
+                            "Timed out waiting for a scheduler slot"
+                        )
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._condition.wait(wait)
+
+            lane.waiting.popleft()
+            self.in_use += 1
+            self._virtual_time = lane.position
+            lane.position += 1 / lane.weight
+            waited = self.clock() - enqueued
+            lane.granted += 1
+            lane.total_wait += waited
+            lane.max_wait = max(lane.max_wait, waited)
+            self._condition.notify_all()
+
+    def release(self):
+        """
+        Returns a slot once a request has completed
+        """
+        with self._condition:
+            self.in_use -= 1
+            self._condition.notify_all()
+
+    def stats(self):
+        """
+        Returns the metrics for every lane, keyed by lane name
+        """
+        with self._condition:
+            return {name: lane.stats() for name, lane in self.lanes.items()}
+
+    def _try_grant(self, lane, ticket):
+        """
+        Returns 0 if the ticket may proceed, else the seconds to wait or None to wait until
+        notified
+        """
+        eligible = [
+            candidate
+            for candidate in self.lanes.values()
+            if candidate.waiting and self.in_use < self._limit(candidate)
+        ]
+        if not eligible:
+            return None
+        chosen = min(eligible, key=lambda candidate: candidate.position)
+        if chosen is not lane or lane.waiting[0] is not ticket:
+            return None
+        if self.rate is None:
+            return 0
+
+        now = self.clock()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._refilled_at) * self.rate
+        )
+        self._refilled_at = now
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        self._tokens -= 1
+        return 0
+
+    def _abandon(self, lane, ticket):
+        # The ticket may have been blocking those behind it, which should now be reconsidered
+        lane.waiting.remove(ticket)
+        self._condition.notify_all()
+
+    def _limit(self, lane):
+        return self.slots if lane.name == INTERACTIVE else self.slots - self.reserved
@@ -0,0 +1,505 @@
+"""
+Compact binary serialization for Address and AddressCollection.
+
+Responses follow a fixed schema, so the field names and the handful of enumerated values (DPV
+codes, record types, state abbreviations and so on) are replaced by small integers from the
+tables below. msgpack is used for the encoding when it is installed, otherwise a stdlib encoder
+with the same interning. The tables are part of the format: entries may only ever be appended.
+"""
+
+import struct
+
+from smartystreets.data import Address, AddressCollection
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+MAGIC = b"SS"
+VERSION = 1
+MSGPACK = b"m"
+STDLIB = b"s"
+
+KEYS = (
+    # Lookup fields
+    "input_id",
+    "input_index",
+    "candidate_index",
+    "street",
+    "street2",
+    "secondary",
+    "city",
+    "state",
+    "zipcode",
+    "lastline",
+    "addressee",
+    "urbanization",
+    "candidates",
+    "match",
+    # Candidate fields
+    "delivery_line_1",
+    "delivery_line_2",
+    "last_line",
+    "delivery_point_barcode",
+    "smarty_key",
+    "components",
+    "metadata",
+    "analysis",
+    # Components
+    "primary_number",
+    "street_name",
+    "street_predirection",
+    "street_postdirection",
+    "street_suffix",
+    "secondary_number",
+    "secondary_designator",
+    "extra_secondary_number",
+    "extra_secondary_designator",
+    "pmb_designator",
+    "pmb_number",
+    "city_name",
+    "default_city_name",
+    "state_abbreviation",
+    "plus4_code",
+    "delivery_point",
+    "delivery_point_check_digit",
+    # Metadata
+    "record_type",
+    "zip_type",
+    "county_fips",
+    "county_name",
+    "carrier_route",
+    "congressional_district",
+    "building_default_indicator",
+    "rdi",
+    "elot_sequence",
+    "elot_sort",
+    "latitude",
+    "longitude",
+    "coordinate_license",
+    "precision",
+    "time_zone",
+    "utc_offset",
+    "dst",
+    # Analysis
+    "dpv_match_code",
+    "dpv_footnotes",
+    "dpv_cmra",
+    "dpv_vacant",
+    "dpv_no_stat",
+    "active",
+    "ews_match",
+    "footnotes",
+    "lacslink_code",
+    "lacslink_indicator",
+    "suitelink_match",
+    "enhanced_match",
+)
+
+VALUES = (
+    # Match codes, flags and record types
+    "Y",
+    "N",
+    "S",
+    "D",
+    "F",
+    "G",
+    "H",
+    "P",
+    "R",
+    "A",
+    "M",
+    "T",
+    "U",
+    # Zip types and RDI
+    "Standard",
+    "Military",
+    "POBox",
+    "Unique",
+    "Residential",
+    "Commercial",
+    # Precision
+    "Unknown",
+    "Zip5",
+    "Zip6",
+    "Zip7",
+    "Zip8",
+    "Zip9",
+    "Street",
+    "Parcel",
+    "Rooftop",
+    # Time zones
+    "Eastern",
+    "Central",
+    "Mountain",
+    "Pacific",
+    "Alaska",
+    "Hawaii",
+    "Samoa",
+    "Atlantic",
+    "Chamorro",
+    # States, territories and military state codes
+    *(
+        "AL AK AZ AR CA CO CT DE DC FL GA HI ID IL IN IA KS KY LA ME MD MA MI MN MS MO MT NE "
+        "NV NH NJ NM NY NC ND OH OK OR PA RI SC SD TN TX UT VT VA WA WV WI WY AS GU MP PR VI "
+        "FM MH PW AA AE AP"
+    ).split(),
+)
+
+KEY_INDEX = {key: index for index, key in enumerate(KEYS)}
+VALUE_INDEX = {value: index for index, value in enumerate(VALUES)}
+
+# The msgpack extension type used for interned values
+INTERNED = 1
+
+# Type tags for the stdlib encoding
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _INTERNED, _LIST, _DICT = range(9)
+_DOUBLE = struct.Struct("<d")
+
+# Kinds of top level object
+_ADDRESS = b"a"
+_COLLECTION = b"c"
+_VALUE = b"v"
+
+
+def default_backend():
+    """
+    Returns the backend used when none is specified: msgpack if installed, else stdlib
+    """
+    return MSGPACK if msgpack is not None else STDLIB
+
+
+def dumps(obj, backend=None):
+    """
+    Serializes an Address, AddressCollection or JSON-like value to bytes
+
+    :param obj: the object to serialize
+    :param backend: optional MSGPACK or STDLIB, defaulting to msgpack when installed
+    :return: bytes
+    """
+    backend = backend or default_backend()
+    if isinstance(obj, AddressCollection):
+        kind = _COLLECTION
+        obj = [obj, obj.unverified]
+    elif isinstance(obj, Address):
+        kind = _ADDRESS
+    else:
+        kind = _VALUE
+    return header(backend) + kind + encode(obj, backend)
+
+
+def loads(data):
+    """
+    Deserializes bytes produced by `dumps` back to the original type
+
+    :param data: bytes
+    :return: an Address, AddressCollection or JSON-like value
+    """
+    data = memoryview(data)
+    backend = read_header(data)
+    kind = bytes(data[4:5])
+    value = decode(data[5:], backend)
+    if kind == _COLLECTION:
+        results, unverified = value
+        return AddressCollection(results, unverified=unverified)
+    if kind == _ADDRESS:
+        return Address(value)
+    return value
+
+
+def dump_stream(addresses, fp, backend=None):
+    """
+    Writes addresses to a binary file one record at a time
+
+    :param addresses: iterable of Address objects or dictionaries
+    :param fp: a file object opened for binary writing
+    :param backend: optional MSGPACK or STDLIB, defaulting to msgpack when installed
+    :return: the number of records written
+    """
+    backend = backend or default_backend()
+    fp.write(header(backend))
+    count = 0
+    for address in addresses:
+        payload = encode(address, backend)
+        fp.write(_varint(len(payload)) + payload)
+        count += 1
+    return count
+
+
+def load_stream(fp):
+    """
+    Generates the Address records from a binary file written by `dump_stream`
+
+    :param fp: a file object opened for binary reading
+    :return: generator of Address objects
+    """
+    backend = read_header(memoryview(fp.read(4)))
+    while True:
+        length = _read_varint_from(fp)
+        if length is None:
+            return
+        yield Address(decode(memoryview(fp.read(length)), backend))
+
+
+def header(backend):
+    """
+    Returns the bytes identifying the format and backend, which precede encoded data
+    """
+    if backend == MSGPACK and msgpack is None:
+        raise ImportError("msgpack is required for the msgpack backend")
+    return MAGIC + bytes([VERSION]) + backend
+
+
+def read_header(data):
+    """
+    Returns the backend named in a header, raising if the data isn't supported
+    """
+    if bytes(data[:2]) != MAGIC or data[2] != VERSION:
+        raise ValueError("Data is not in a supported serialization format")
+    backend = bytes(data[3:4])
+    if backend == MSGPACK and msgpack is None:
+        raise ImportError("msgpack is required to read this data")
+    return backend
+
+
+def encode(obj, backend):
+    """
+    Encodes a value without a header, e.g. for storing records after one header
+    """
+    if backend == MSGPACK:
+        return msgpack.packb(_intern(obj), use_bin_type=True)
+    out = bytearray()
+    _write(obj, out)
+    return bytes(out)
+
+
+def decode(data, backend):
+    """
+    Decodes a value written by `encode` with the same backend
+    """
+    if backend == MSGPACK:
+        return msgpack.unpackb(
+            data, strict_map_key=False, ext_hook=_ext_hook, object_hook=_map_hook
+        )
+    value, _ = _read(data, 0)
+    return value
+
+
+# msgpack backend. Interned keys become integer map keys, which JSON-like data never has, and
+# interned values become extension types.
+
+
+def _intern(obj):
+    if isinstance(obj, dict):
+        return {
+            KEY_INDEX.get(_check_key(key), key): _intern(value)
+            for key, value in obj.items()
+        }
+    if isinstance(obj, (list, tuple)):
+        return [_intern(value) for value in obj]
+    # An extension type takes three bytes, so short strings are left as they are
+    if isinstance(obj, str) and len(obj) > 2 and obj in VALUE_INDEX:
+        return msgpack.ExtType(INTERNED, _varint(VALUE_INDEX[obj]))
+    return obj
+
+
+def _ext_hook(code, data):
+    if code != INTERNED:
+        return msgpack.ExtType(code, data)
+    return VALUES[_read_varint(memoryview(data), 0)[0]]
+
+
+def _map_hook(obj):
+    return {
+        KEYS[key] if isinstance(key, int) else key: value for key, value in obj.items()
+    }
+
+
+def _check_key(key):
+    if not isinstance(key, str):
+        raise TypeError(f"Only string keys can be serialized, not {key!r}")
+    return key
+
+
+# stdlib backend
+
+
+def _write(obj, out):
+    writer = _WRITERS.get(type(obj))
+    if writer is None:
+        # Subclasses such as Address and AddressCollection
+        for kind, writer in _WRITERS.items():
+            if isinstance(obj, kind):
+                break
+        else:
+            raise TypeError(f"Cannot serialize {type(obj).__name__}")
+    writer(obj, out)
+
+
+def _write_none(obj, out):
+    out.append(_NONE)
+
+
+def _write_bool(obj, out):
+    out.append(_TRUE if obj else _FALSE)
+
+
+def _write_int(obj, out):
+    if not -(2**63) <= obj < 2**63:
+        raise OverflowError("Integers must fit in 64 bits to be serialized")
+    out.append(_INT)
+    # Zigzag encoding keeps small negative numbers small
+    out += _varint((obj << 1) ^ (obj >> 63))
+
+
+def _write_float(obj, out):
+    out.append(_FLOAT)
+    out += _DOUBLE.pack(obj)
+
+
+def _write_str(obj, out):
+    index = VALUE_INDEX.get(obj)
+    if index is None:
+        encoded = obj.encode("utf-8")
+        out.append(_STR)
+        out += _varint(len(encoded))
+        out += encoded
+    else:
+        out.append(_INTERNED)
+        out += _varint(index)
+
+
+def _write_dict(obj, out):
+    out.append(_DICT)
+    out += _varint(len(obj))
+    for key, value in obj.items():
+        _check_key(key)
+        index = KEY_INDEX.get(key)
+        # The low bit distinguishes an interned key index from a string length
+        if index is None:
+            encoded = key.encode("utf-8")
+            out += _varint(len(encoded) << 1)
+            out += encoded
+        else:
+            out += _varint(index << 1 | 1)
+        _write(value, out)
+
+
+def _write_list(obj, out):
+    out.append(_LIST)
+    out += _varint(len(obj))
+    for value in obj:
+        _write(value, out)
+
+
+# bool precedes int, of which it is a subclass
+_WRITERS = {
+    type(None): _write_none,
+    bool: _write_bool,
+    int: _write_int,
+    float: _write_float,
+    str: _write_str,
+    dict: _write_dict,
+    list: _write_list,
+    tuple: _write_list,
+}
+
+
+def _read(data, position):
+    tag = data[position]
+    if tag >= len(_READERS):
+        raise ValueError(f"Unknown type tag {tag}")
+    return _READERS[tag](data, position + 1)
+
+
+def _read_interned(data, position):
+    index, position = _read_varint(data, position)
+    return VALUES[index], position
+
+
+def _read_str(data, position):
+    length, position = _read_varint(data, position)
+    end = position + length
+    return str(data[position:end], "utf-8"), end
+
+
+def _read_int(data, position):
+    value, position = _read_varint(data, position)
+    return (value >> 1) ^ -(value & 1), position
+
+
+def _read_float(data, position):
+    return _DOUBLE.unpack_from(data, position)[0], position + 8
+
+
+def _read_dict(data, position):
+    count, position = _read_varint(data, position)
+    obj = {}
+    for _ in range(count):
+        header, position = _read_varint(data, position)
+        if header & 1:
+            key = KEYS[header >> 1]
+        else:
+            end = position + (header >> 1)
+            key = str(data[position:end], "utf-8")
+            position = end
+        obj[key], position = _read(data, position)
+    return obj, position
+
+
+def _read_list(data, position):
+    count, position = _read_varint(data, position)
+    obj = []
+    for _ in range(count):
+        value, position = _read(data, position)
+        obj.append(value)
+    return obj, position
+
+
+# Indexed by type tag
+_READERS = (
+    lambda data, position: (None, position),
+    lambda data, position: (False, position),
+    lambda data, position: (True, position),
+    _read_int,
+    _read_float,
+    _read_str,
+    _read_interned,
+    _read_list,
+    _read_dict,
+)
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _read_varint(data, position):
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def _read_varint_from(fp):
+    value = shift = 0
+    while True:
+        byte = fp.read(1)
+        if not byte:
+            if shift:
+                raise ValueError("Truncated stream")
+            return None
+        value |= (byte[0] & 0x7F) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
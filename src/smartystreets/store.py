@@ -0,0 +1,364 @@
+"""
+On-disk result store for jobs too large to hold in memory.
+
+Results are appended to a data file in the compact serialization format as batches complete,
+with a fixed-width entry per result in an index file. Reads go through memory maps of both
+files, so any result can be fetched by position, input_index or input_id while only the pages
+touched are resident. Closing a writable store also writes sorted lookup files which make
+`get` and `get_index` binary searches rather than scans, and a file of the input indexes which
+weren't verified.
+"""
+
+import array
+import contextlib
+import hashlib
+import heapq
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+from smartystreets import serialization
+from smartystreets.data import Address
+
+# input_index (-1 for none), data offset, data length, input_id hash, has input_id
+ENTRY = struct.Struct("<qQIq?")
+# lookup key, position
+LOOKUP = struct.Struct("<qq")
+# Lookups sorted in memory at a time when writing the lookup files, about 10 MB
+SORT_RUN = 1 << 17
+
+
+def id_hash(key):
+    """
+    Returns a signed 64-bit hash of an input_id
+    """
+    digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest()
+    return struct.unpack("<q", digest)[0]
+
+
+def _write_run(fp, keys, positions):
+    """
+    Writes a run of lookups to a file sorted by key, then position
+    """
+    # Stable, so positions stay in append order for equal keys
+    for i in sorted(range(len(keys)), key=keys.__getitem__):
+        fp.write(LOOKUP.pack(keys[i], positions[i]))
+    fp.seek(0)
+    return fp
+
+
+def _read_run(fp):
+    """
+    Generates the (key, position) lookups of a run file
+    """
+    for block in iter(lambda: fp.read(LOOKUP.size * 4096), b""):
+        yield from LOOKUP.iter_unpack(block)
+
+
+def _index_key(entry):
+    return None if entry[0] < 0 else entry[0]
+
+
+def _id_key(entry):
+    return entry[3] if entry[4] else None
+
+
+class _MappedFile:
+    """
+    A read-only memory map of a file which may still be growing
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.map = None
+        self.size = 0
+
+    def view(self, size=None):
+        """
+        Returns a map covering at least `size` bytes, or the whole file if no size is given
+
+        The file is only mapped again once it has grown past the current map, so a store which
+        isn't being written maps each file once.
+        """
+        if self.map is None if size is None else size > self.size:
+            self.close()
+            with open(self.path, "rb") as fp:
+                self.size = os.fstat(fp.fileno()).st_size
+                if self.size:
+                    self.map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.size = 0
+
+
+class ResultStore:
+    """
+    Class for storing results on disk with AddressCollection style random access
+    """
+
+    def __init__(self, path, mode="r", backend=None):
+        """
+        Opens or creates the store
+
+        :param path: path of the data file; index files are written alongside it
+        :param mode: "r" to read an existing store or "w" to create a new one
+        :param backend: optional serialization backend for a new store
+        :return: the store
+        """
+        if mode not in ("r", "w"):
+            raise ValueError(f"Unknown mode {mode!r}")
+        self.path = path
+        self.writable = mode == "w"
+        self._paths = {name: f"{path}.{name}" for name in ("idx", "byindex", "byid")}
+        self._unverified_path = f"{path}.unverified"
+        if self.writable:
+            self.backend = backend or serialization.default_backend()
+            header = serialization.header(self.backend)
+            self._data = open(path, "wb")
+            self._data.write(header)
+            self._index = open(self._paths["idx"], "wb")
+            for old in (
+                self._paths["byindex"],
+                self._paths["byid"],
+                self._unverified_path,
+            ):
+                if os.path.exists(old):
+                    os.remove(old)
+            # Sizes are tracked as results are written rather than asking the filesystem
+            self._count = 0
+            self._data_size = len(header)
+            self._sorted = False
+            self.unverified = []
+        else:
+            with open(path, "rb") as fp:
+                self.backend = serialization.read_header(memoryview(fp.read(4)))
+            self._data = self._index = None
+            self._count = os.path.getsize(self._paths["idx"]) // ENTRY.size
+            self._sorted = os.path.exists(self._paths["byindex"])
+            self.unverified = self._read_unverified()
+        self._maps = {
+            name: _MappedFile(file_path)
+            for name, file_path in [("data", path), *self._paths.items()]
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, address):
+        """
+        Appends a single result
+        """
+        if not self.writable:
+            raise ValueError("The store is not open for writing")
+        payload = serialization.encode(address, self.backend)
+        index = address.get("input_index")
+        key = address.get("input_id")
+        self._index.write(
+            ENTRY.pack(
+                -1 if index is None else index,
+                self._data_size,
+                len(payload),
+                0 if key is None else id_hash(key),
+                key is not None,
+            )
+        )
+        self._data.write(payload)
+        self._data_size += len(payload)
+        self._count += 1
+
+    def extend(self, addresses):
+        """
+        Appends each of an iterable of results
+        """
+        for address in addresses:
+            self.append(address)
+
+    def flush(self):
+        """
+        Writes buffered results to disk so that they can be read
+        """
+        if self.writable:
+            self._data.flush()
+            self._index.flush()
+
+    def close(self):
+        """
+        Closes the store, first writing the sorted lookup files and the unverified input
+        indexes if it was open for writing
+        """
+        if self.writable:
+            self.flush()
+            self._write_lookups()
+            with open(self._unverified_path, "wb") as fp:
+                array.array("q", self.unverified).tofile(fp)
+            self._data.close()
+            self._index.close()
+            self.writable = False
+            self._sorted = True
+        for mapped in self._maps.values():
+            mapped.close()
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def __getitem__(self, position):
+        """
+        Returns the result at a position in the order results were appended
+        """
+        length = len(self)
+        if position < 0:
+            position += length
+        if not 0 <= position < length:
+            raise IndexError("ResultStore index out of range")
+        _, offset, size, _, _ = self._entry(position)
+        data = self._view("data", offset + size)
+        return Address(serialization.decode(data[offset : offset + size], self.backend))
+
+    def get(self, key):
+        """
+        Returns an address by user controlled input ID
+
+        Until a writable store is closed this scans the index of every result.
+
+        :param key: an input_id used to tag a lookup address
+        :return: a matching Address
+        """
+        for position in reversed(self._find("byid", id_hash(key), _id_key)):
+            address = self[position]
+            if address.id == key:
+                return address
+        raise KeyError(key)
+
+    def get_index(self, key):
+        """
+        Returns an address by input index, a value that matches the list index of the provided
+        lookup value, not necessarily the result.
+
+        :param key: an input_index matching the index of the provided address
+        :return: a matching Address
+        """
+        if not isinstance(key, int):
+            raise KeyError(key)
+        positions = self._find("byindex", key, _index_key)
+        if not positions:
+            raise KeyError(key)
+        return self[positions[-1]]
+
+    def _view(self, name, size=None):
+        # Results still buffered for writing must reach the file before it is mapped
+        if self.writable and size > self._maps[name].size:
+            self.flush()
+        return self._maps[name].view(size)
+
+    def _entry(self, position):
+        return ENTRY.unpack_from(
+            self._view("idx", (position + 1) * ENTRY.size), position * ENTRY.size
+        )
+
+    def _entries(self):
+        """
+        Generates every index entry in append order
+        """
+        if self._count:
+            yield from ENTRY.iter_unpack(self._view("idx", self._count * ENTRY.size))
+
+    def _find(self, name, key, entry_key):
+        """
+        Returns the positions of entries with a key, in append order
+
+        Uses a binary search of the sorted lookup file when the store has been closed after
+        writing, otherwise scans the index.
+        """
+        if not self._sorted:
+            return [
+                position
+                for position, entry in enumerate(self._entries())
+                if entry_key(entry) == key
+            ]
+
+        lookup = self._view(name)
+        count = len(lookup) // LOOKUP.size if lookup is not None else 0
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if LOOKUP.unpack_from(lookup, middle * LOOKUP.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        positions = []
+        while low < count:
+            found, position = LOOKUP.unpack_from(lookup, low * LOOKUP.size)
+            if found != key:
+                break
+            positions.append(position)
+            low += 1
+        return positions
+
+    def _write_lookups(self):
+        # Lookups are sorted in runs of SORT_RUN held in compact arrays and merged from
+        # temporary files, so memory use doesn't grow with the number of results. Runs of
+        # results appended in key order already, as they are for input_index from a bulk job,
+        # are copied without merging.
+        directory = os.path.dirname(os.path.abspath(self.path))
+        for name, entry_key in (("byindex", _index_key), ("byid", _id_key)):
+            with contextlib.ExitStack() as stack:
+                runs, ordered = self._sorted_runs(
+                    entry_key,
+                    lambda: stack.enter_context(tempfile.TemporaryFile(dir=directory)),
+                )
+                with open(self._paths[name], "wb") as fp:
+                    if ordered:
+                        for run in runs:
+                            shutil.copyfileobj(run, fp)
+                    else:
+                        for lookup in heapq.merge(*map(_read_run, runs)):
+                            fp.write(LOOKUP.pack(*lookup))
+
+    def _sorted_runs(self, entry_key, open_run):
+        """
+        Writes the lookups of the entries with a key to sorted runs of at most SORT_RUN
+
+        :param entry_key: function returning an entry's key, or None
+        :param open_run: function returning a new file for a run
+        :return: the run files and whether the keys were already in order
+        """
+        runs = []
+        keys = array.array("q")
+        positions = array.array("q")
+        ordered = True
+        last = None
+        for position, entry in enumerate(self._entries()):
+            key = entry_key(entry)
+            if key is None:
+                continue
+            ordered = ordered and (last is None or last <= key)
+            last = key
+            keys.append(key)
+            positions.append(position)
+            if len(keys) == SORT_RUN:
+                runs.append(_write_run(open_run(), keys, positions))
+                keys = array.array("q")
+                positions = array.array("q")
+        if keys:
+            runs.append(_write_run(open_run(), keys, positions))
+        return runs, ordered
+
+    def _read_unverified(self):
+        unverified = array.array("q")
+        if os.path.exists(self._unverified_path):
+            with open(self._unverified_path, "rb") as fp:
+                unverified.frombytes(fp.read())
+        return unverified.tolist()
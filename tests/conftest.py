@@ -0,0 +1,58 @@
+"""Fixtures shared across the test modules"""
+
+import json
+
+import httpx
+import pytest
+
+from smartystreets.client import Client
+
+
+class Clock:
+    """A clock which only moves when `now` is set"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def echo(request):
+    """
+    Responds to a street address request with a result for each lookup, echoing its
+    input_index and input_id, with its street upper cased as the delivery line
+    """
+    return httpx.Response(
+        200,
+        json=[
+            {
+                "input_index": index,
+                "input_id": lookup.get("input_id"),
+                "delivery_line_1": lookup.get("street", "").upper(),
+            }
+            for index, lookup in enumerate(json.loads(request.content))
+        ],
+    )
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def smarty_client():
+    yield Client(auth_id="blah", auth_token="blibbidy")
+
+
+@pytest.fixture
+def street_address_url():
+    return (
+        "https://api.smartystreets.com/street-address?auth-id=blah&auth-token=blibbidy"
+    )
+
+
+@pytest.fixture
+def echo_route(respx_mock, street_address_url):
+    return respx_mock.post(street_address_url).mock(side_effect=echo)
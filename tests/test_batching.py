@@ -0,0 +1,99 @@
+"""Tests for batch packing
+
+Properties are checked against generated lookup streams: every batch is within the limits,
+the batches reproduce the input in order, and no batch could have taken the next lookup.
+"""
+
+import httpx
+from hypothesis import given, strategies as st
+
+from smartystreets.batching import BatchPacker, MAX_LOOKUPS
+from smartystreets.client import Client
+
+lookups = st.lists(
+    st.fixed_dictionaries(
+        {"street": st.text(max_size=200)},
+        optional={"candidates": st.integers(min_value=1, max_value=10)},
+    ),
+    max_size=300,
+)
+
+packers = st.builds(
+    BatchPacker,
+    max_count=st.integers(min_value=1, max_value=MAX_LOOKUPS),
+    max_body_bytes=st.integers(min_value=1300, max_value=8 * 1024),
+    max_response_bytes=st.none() | st.integers(min_value=100, max_value=1000),
+    candidate_bytes=st.just(10),
+)
+
+
+def body_bytes(batch):
+    return (
+        2 + sum(BatchPacker().body_size(lookup) for lookup in batch) + (len(batch) - 1)
+    )
+
+
+def legal(packer, batches):
+    """Batches other than those of a single oversized lookup"""
+    return [
+        batch
+        for batch in batches
+        if not (len(batch) == 1 and packer.oversized(batch[0]))
+    ]
+
+
+@given(packers, lookups)
+def test_batches_are_legal(packer, stream):
+    for batch in legal(packer, packer.pack(stream)):
+        assert 0 < len(batch) <= packer.max_count
+        assert body_bytes(batch) <= packer.max_body_bytes
+        if packer.max_response_bytes is not None:
+            response = sum(packer.response_size(lookup) for lookup in batch)
+            assert response <= packer.max_response_bytes
+
+
+@given(packers, lookups)
+def test_batches_preserve_input(packer, stream):
+    assert [lookup for batch in packer.pack(stream) for lookup in batch] == stream
+
+
+@given(packers, lookups)
+def test_batches_are_full(packer, stream):
+    """Each batch was only closed because the next lookup could not fit"""
+    batches = list(packer.pack(stream))
+    for batch, following in zip(batches, batches[1:]):
+        merged = batch + following[:1]
+        response = sum(packer.response_size(lookup) for lookup in merged)
+        assert (
+            len(merged) > packer.max_count
+            or body_bytes(merged) > packer.max_body_bytes
+            or (
+                packer.max_response_bytes is not None
+                and response > packer.max_response_bytes
+            )
+        )
+
+
+def test_body_size_bound(smarty_client, respx_mock):
+    """The request body sent matches the size accounted for"""
+    route = respx_mock.post(url__startswith=Client.BASE_URL).mock(
+        return_value=httpx.Response(200, json=[])
+    )
+    batch = [{"street": "100 Main St"}, {"street": "6 S Blvd, Richmönd, VA"}]
+    smarty_client.post("street-address", batch)
+    assert body_bytes(batch) == len(route.calls.last.request.content)
+
+
+def test_oversized_lookup():
+    """A lookup which can't be sent is generated alone rather than raising"""
+    packer = BatchPacker(max_body_bytes=30)
+    big = {"street": "100 Main St, Anywhere, USA"}
+    stream = [{"street": "1"}, big, {"street": "2"}]
+    assert packer.oversized(big)
+    assert list(packer.pack(stream)) == [[{"street": "1"}], [big], [{"street": "2"}]]
+
+
+def test_candidates_split_batches():
+    packer = BatchPacker(max_response_bytes=3000, candidate_bytes=1000)
+    stream = [{"street": "1", "candidates": 2}, {"street": "2", "candidates": 2}]
+    assert [len(batch) for batch in packer.pack(stream)] == [1, 1]
@@ -0,0 +1,140 @@
+"""Tests for the circuit breaker"""
+
+import httpx
+import pytest
+
+from smartystreets.breaker import CircuitBreaker
+from smartystreets.client import Client
+from smartystreets import exceptions
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(
+        failure_rate=0.5, window=4, minimum_calls=4, cooldown=10, clock=clock
+    )
+
+
+class TestCircuitBreaker:
+    def test_opens_on_failure_rate(self, breaker):
+        for failed in (False, True, False):
+            breaker.record(0.1, failed=failed)
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.record(0.1, failed=True)
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(exceptions.SmartyStreetsCircuitOpenError):
+            breaker.before_call()
+
+    def test_opens_on_slow_calls(self):
+        breaker = CircuitBreaker(
+            slow_call_rate=0.5, slow_call_duration=1, window=2, minimum_calls=2
+        )
+        breaker.record(2.0)
+        breaker.record(1.5)
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_half_open_recovery(self, breaker, clock):
+        for _ in range(4):
+            breaker.record(0.1, failed=True)
+        clock.now = 10
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        breaker.before_call()
+        # Only one probe is admitted at a time
+        with pytest.raises(exceptions.SmartyStreetsCircuitOpenError):
+            breaker.before_call()
+        breaker.record(0.1)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_failure_reopens(self, breaker, clock):
+        for _ in range(4):
+            breaker.record(0.1, failed=True)
+        clock.now = 10
+        breaker.before_call()
+        breaker.record(0.1, failed=True)
+        assert breaker.state == CircuitBreaker.OPEN
+        clock.now = 15
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_listeners(self, breaker, clock):
+        transitions = []
+        breaker.add_listener(lambda b, old, new: transitions.append((old, new)))
+        for _ in range(4):
+            breaker.record(0.1, failed=True)
+        clock.now = 10
+        breaker.before_call()
+        breaker.record(0.1)
+        assert transitions == [
+            ("closed", "open"),
+            ("open", "half-open"),
+            ("half-open", "closed"),
+        ]
+
+    def test_is_failure(self, breaker):
+        assert breaker.is_failure(exceptions.SmartyStreetsServerError())
+        assert breaker.is_failure(httpx.ConnectTimeout("timed out"))
+        assert not breaker.is_failure(exceptions.SmartyStreetsInputError())
+        assert not breaker.is_failure(exceptions.SmartyStreetsAuthError())
+        assert not breaker.is_failure(exceptions.SmartyStreetsDeadlineError())
+        assert not breaker.is_failure(httpx.PoolTimeout("no slot"))
+
+    @pytest.mark.parametrize(
+        "error",
+        [exceptions.SmartyStreetsDeadlineError(), httpx.PoolTimeout("no slot")],
+    )
+    def test_neutral_probe_does_not_close(self, breaker, clock, error):
+        """A probe ended without an API response neither closes nor reopens the breaker"""
+        for _ in range(4):
+            breaker.record(0.1, failed=True)
+        clock.now = 10
+
+        def interrupted():
+            raise error
+
+        with pytest.raises(type(error)):
+            breaker.call(interrupted)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        # The probe was given back, so another may be made
+        assert breaker.call(lambda: "ok") == "ok"
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+class TestClientBreaker:
+    def test_fails_fast(self, breaker, respx_mock, street_address_url):
+        client = Client("blah", "blibbidy", circuit_breaker=breaker)
+        route = respx_mock.post(street_address_url).mock(
+            return_value=httpx.Response(500)
+        )
+        for _ in range(4):
+            with pytest.raises(exceptions.SmartyStreetsServerError):
+                client.street_addresses([{"street": "100 Main St"}])
+
+        with pytest.raises(exceptions.SmartyStreetsCircuitOpenError):
+            client.street_addresses([{"street": "100 Main St"}])
+        assert route.call_count == 4
+
+    def test_input_errors_do_not_trip(self, breaker, respx_mock, street_address_url):
+        client = Client("blah", "blibbidy", circuit_breaker=breaker)
+        respx_mock.post(street_address_url).mock(return_value=httpx.Response(400))
+        for _ in range(5):
+            with pytest.raises(exceptions.SmartyStreetsInputError):
+                client.street_addresses([{"street": "100 Main St"}])
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_deadline_timeouts_do_not_trip(
+        self, breaker, respx_mock, street_address_url
+    ):
+        """A caller's tight deadline isn't mistaken for an unhealthy API"""
+        client = Client("blah", "blibbidy", circuit_breaker=breaker)
+        respx_mock.post(street_address_url).mock(
+            side_effect=httpx.ReadTimeout("timed out")
+        )
+        for _ in range(4):
+            response = client.bulk_street_addresses(["100 Main St"], deadline=0.05)
+            assert response.unverified == [0]
+        assert breaker.state == CircuitBreaker.CLOSED
+
+        # Deadline timeouts aren't recorded, while timeouts without a deadline are failures
+        for _ in range(4):
+            with pytest.raises(httpx.ReadTimeout):
+                client.bulk_street_addresses(["100 Main St"])
+        assert breaker.state == CircuitBreaker.OPEN
@@ -7,27 +7,18 @@ test_smartystreets
 Tests for `smartystreets` module.
 """
 
+import json
+import time
 
 import pytest
 import httpx
 
+from smartystreets.batching import BatchPacker
 from smartystreets.client import Client
 from smartystreets import data
 from smartystreets import exceptions
 
 
-@pytest.fixture
-def smarty_client():
-    yield Client(auth_id="blah", auth_token="blibbidy")
-
-
-@pytest.fixture
-def street_address_url():
-    return (
-        "https://api.smartystreets.com/street-address?auth-id=blah&auth-token=blibbidy"
-    )
-
-
 class TestClient:
     def test_input_error(self, smarty_client, respx_mock, street_address_url):
         respx_mock.post(street_address_url).mock(return_value=httpx.Response(400))
@@ -75,3 +66,104 @@ class TestClient:
         )
         assert isinstance(response, data.AddressCollection)
         assert len(response) == 2
+
+    def test_bulk_addresses(self, smarty_client, echo_route):
+        """Ensure bulk results are combined with input_index matching the full input"""
+        response = smarty_client.bulk_street_addresses(
+            {"street": "100 Main St", "input_id": str(i)} for i in range(250)
+        )
+        assert echo_route.call_count == 3
+        assert isinstance(response, data.AddressCollection)
+        assert len(response) == 250
+        assert response.get_index(249).id == "249"
+        assert response.get("120").index == 120
+
+    def test_string_addresses(self, smarty_client, respx_mock, street_address_url):
+        """Each freeform address is submitted as its own lookup"""
+        route = respx_mock.post(street_address_url).mock(
+            return_value=httpx.Response(200, json=[])
+        )
+        smarty_client.street_addresses(["100 Main St", "200 Main St"])
+        assert json.loads(route.calls.last.request.content) == [
+            {"street": "100 Main St"},
+            {"street": "200 Main St"},
+        ]
+
+    def test_oversized_unverified(self, smarty_client, respx_mock, street_address_url):
+        """An address too large to send is listed as unverified, not raised mid-stream"""
+        route = respx_mock.post(street_address_url).mock(
+            return_value=httpx.Response(200, json=[{"input_index": 0}])
+        )
+        response = smarty_client.bulk_street_addresses(
+            ["1 Main St", "100 Main St, Anywhere, USA", "2 Main St"],
+            packer=BatchPacker(max_body_bytes=30),
+        )
+        assert route.call_count == 2
+        assert [address.index for address in response] == [0, 2]
+        assert response.unverified == [1]
+
+    def test_deadline_partial_results(
+        self, smarty_client, respx_mock, street_address_url
+    ):
+        """Batches which can't complete within the deadline are flagged, not sent"""
+
+        def respond(request):
+            time.sleep(0.2)
+            return httpx.Response(200, json=[{"input_index": 0}])
+
+        route = respx_mock.post(street_address_url).mock(side_effect=respond)
+        response = smarty_client.bulk_street_addresses(
+            ["100 Main St", "200 Main St", "300 Main St"],
+            packer=BatchPacker(max_count=1),
+            deadline=0.3,
+        )
+        assert route.call_count == 1
+        assert [address.index for address in response] == [0]
+        assert response.unverified == [1, 2]
+        assert route.calls.last.request.extensions["timeout"]["read"] <= 0.3
+
+    def test_deadline_timeout(self, smarty_client, respx_mock, street_address_url):
+        """A request timing out within the deadline leaves its addresses unverified"""
+        respx_mock.post(street_address_url).mock(
+            side_effect=httpx.ReadTimeout("timed out")
+        )
+        response = smarty_client.bulk_street_addresses(["100 Main St"], deadline=1)
+        assert len(response) == 0
+        assert response.unverified == [0]
+
+        with pytest.raises(httpx.ReadTimeout):
+            smarty_client.bulk_street_addresses(["100 Main St"])
+
+    def test_deadline_upstream_error(
+        self, smarty_client, respx_mock, street_address_url
+    ):
+        """A server error on a later batch keeps the batches already verified"""
+        respx_mock.post(street_address_url).mock(
+            side_effect=[
+                httpx.Response(200, json=[{"input_index": 0}]),
+                httpx.Response(500),
+            ]
+        )
+        response = smarty_client.bulk_street_addresses(
+            ["100 Main St", "200 Main St"], packer=BatchPacker(max_count=1), deadline=5
+        )
+        assert [address.index for address in response] == [0]
+        assert response.unverified == [1]
+
+    def test_deadline_limits_retries(self, respx_mock):
+        """Each credential retry's timeout is limited to the time then remaining"""
+
+        def throttled(request):
+            time.sleep(0.1)
+            return httpx.Response(429)
+
+        respx_mock.post(url__startswith=Client.BASE_URL).mock(
+            side_effect=[throttled, httpx.Response(200, json=[])]
+        )
+        client = Client(credentials=[("a", "1"), ("b", "2")], timeout=10)
+        client.post("street-address", [], deadline_at=time.monotonic() + 1)
+        first, second = (
+            call.request.extensions["timeout"] for call in respx_mock.calls
+        )
+        assert first["read"] <= 1
+        assert second["read"] <= first["read"] - 0.1
@@ -0,0 +1,108 @@
+"""Tests for credential pooling"""
+
+import httpx
+import pytest
+
+from smartystreets.client import Client
+from smartystreets.credentials import CredentialPool
+from smartystreets import exceptions
+
+
+def url_for(auth_id):
+    return (
+        "https://api.smartystreets.com/street-address"
+        f"?auth-id={auth_id}&auth-token=token-{auth_id}"
+    )
+
+
+class TestCredentialPool:
+    def test_requires_credentials(self):
+        with pytest.raises(ValueError):
+            CredentialPool([])
+
+    def test_round_robin(self):
+        pool = CredentialPool([("a", "1"), ("b", "2"), ("c", "3")])
+        ids = []
+        for _ in range(6):
+            credential = pool.acquire()
+            ids.append(credential.auth_id)
+            pool.release(credential)
+        assert ids == ["a", "b", "c", "a", "b", "c"]
+
+    def test_least_loaded(self):
+        pool = CredentialPool(
+            [("a", "1"), ("b", "2")], strategy=CredentialPool.LEAST_LOADED
+        )
+        first = pool.acquire()
+        second = pool.acquire()
+        assert first.auth_id != second.auth_id
+        pool.release(first)
+        assert pool.acquire() is first
+
+    def test_ejection_and_recovery(self, clock):
+        pool = CredentialPool(
+            [("a", "1"), ("b", "2")], eject_for=30, throttle_for=5, clock=clock
+        )
+        credential = pool.acquire()
+        pool.release(credential, exceptions.SmartyStreetsPaymentError)
+        assert [pool.acquire().auth_id for _ in range(3)] == ["b", "b", "b"]
+        assert pool.usage()["a"]["ejected"]
+
+        clock.now = 31
+        assert not pool.usage()["a"]["ejected"]
+        assert pool.acquire().auth_id == "a"
+
+    def test_all_ejected_falls_back(self, clock):
+        pool = CredentialPool([("a", "1"), ("b", "2")], clock=clock)
+        a, b = pool.acquire(), pool.acquire()
+        pool.release(a, exceptions.SmartyStreetsAuthError)
+        pool.release(b, exceptions.SmartyStreetsRateLimitError)
+        # The throttled key recovers first
+        assert pool.acquire() is b
+
+    def test_usage(self):
+        pool = CredentialPool([("a", "1"), ("b", "2")])
+        credential = pool.acquire()
+        pool.release(credential, exceptions.SmartyStreetsRateLimitError)
+        pool.acquire()
+        usage = pool.usage()
+        assert usage["a"] == {
+            "requests": 1,
+            "in_flight": 0,
+            "throttled": 1,
+            "failures": 0,
+            "ejected": True,
+        }
+        assert usage["b"]["in_flight"] == 1
+
+
+class TestClientPool:
+    def test_requires_auth(self):
+        with pytest.raises(ValueError):
+            Client()
+
+    def test_retries_with_next_key(self, respx_mock):
+        client = Client(credentials=[("a", "token-a"), ("b", "token-b")])
+        respx_mock.post(url_for("a")).mock(return_value=httpx.Response(402))
+        respx_mock.post(url_for("b")).mock(
+            return_value=httpx.Response(200, json=[{"input_index": 0}])
+        )
+        assert len(client.street_addresses([{"street": "100 Main St"}])) == 1
+        usage = client.credentials.usage()
+        assert usage["a"]["failures"] == 1
+        assert usage["b"]["requests"] == 1
+
+    def test_input_error_not_retried(self, respx_mock):
+        client = Client(credentials=[("a", "token-a"), ("b", "token-b")])
+        respx_mock.post(url_for("a")).mock(return_value=httpx.Response(400))
+        route_b = respx_mock.post(url_for("b"))
+        with pytest.raises(exceptions.SmartyStreetsInputError):
+            client.street_addresses([{"street": "100 Main St"}])
+        assert not route_b.called
+
+    def test_all_keys_fail(self, respx_mock):
+        client = Client(credentials=[("a", "token-a"), ("b", "token-b")])
+        respx_mock.post(url_for("a")).mock(return_value=httpx.Response(401))
+        respx_mock.post(url_for("b")).mock(return_value=httpx.Response(429))
+        with pytest.raises(exceptions.SmartyStreetsRateLimitError):
+            client.street_addresses([{"street": "100 Main St"}])
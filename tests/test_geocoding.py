@@ -0,0 +1,142 @@
+"""Tests for cached reverse geocoding"""
+
+import threading
+import time
+
+import httpx
+import pytest
+
+from smartystreets import exceptions
+from smartystreets.client import Client
+from smartystreets.data import ReverseGeoResult
+from smartystreets.geocoding import ReverseGeocoder, geohash, geohash_center
+
+RESPONSE = {
+    "results": [
+        {
+            "coordinate": {"latitude": 40.111, "longitude": -111.111},
+            "distance": 2.7,
+            "address": {
+                "street": "2335 S State St",
+                "city": "Provo",
+                "state_abbreviation": "UT",
+            },
+        }
+    ]
+}
+
+
+@pytest.fixture
+def route(respx_mock):
+    return respx_mock.get(url__startswith=Client.REVERSE_GEO_URL).mock(
+        return_value=httpx.Response(200, json=RESPONSE)
+    )
+
+
+def test_geohash():
+    assert geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash(57.64911, 10.40744) == "u4pruydq"
+
+
+def test_geohash_center():
+    cell = geohash(40.1111, -111.1111, 7)
+    latitude, longitude = geohash_center(cell)
+    assert geohash(latitude, longitude, 7) == cell
+    assert abs(latitude - 40.1111) < 0.001
+    assert abs(longitude - -111.1111) < 0.001
+
+
+def test_client_reverse_geocode(smarty_client, route):
+    results = smarty_client.reverse_geocode(40.111, -111.111)
+    assert isinstance(results[0], ReverseGeoResult)
+    assert results[0].address["city"] == "Provo"
+    assert results[0].distance == 2.7
+    assert results[0].location == (40.111, -111.111)
+    params = route.calls.last.request.url.params
+    assert params["latitude"] == "40.111"
+    assert params["auth-id"] == "blah"
+
+
+def test_nearby_points_cached(smarty_client, route):
+    geocoder = ReverseGeocoder(smarty_client, precision=8)
+    first = geocoder.lookup(40.11111, -111.11111)
+    # A few meters of GPS jitter stays within the cell
+    second = geocoder.lookup(40.11112, -111.11113)
+    assert first == second
+    assert route.call_count == 1
+    assert geocoder.stats() == {"hits": 1, "misses": 1, "coalesced": 0, "cached": 1}
+
+
+def test_ttl_and_eviction(smarty_client, route):
+    now = [0.0]
+    geocoder = ReverseGeocoder(smarty_client, max_size=1, ttl=60, clock=lambda: now[0])
+    geocoder.lookup(40.1, -111.1)
+    geocoder.lookup(41.1, -111.1)
+    geocoder.lookup(41.1, -111.1)
+    assert route.call_count == 2
+    geocoder.lookup(40.1, -111.1)
+    assert route.call_count == 3
+
+    now[0] = 61
+    geocoder.lookup(40.1, -111.1)
+    assert route.call_count == 4
+
+
+def test_concurrent_lookups_coalesced(smarty_client, respx_mock):
+    def respond(request):
+        time.sleep(0.2)
+        return httpx.Response(200, json=RESPONSE)
+
+    route = respx_mock.get(url__startswith=Client.REVERSE_GEO_URL).mock(
+        side_effect=respond
+    )
+    geocoder = ReverseGeocoder(smarty_client)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(geocoder.lookup(40.1, -111.1)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert route.call_count == 1
+    assert len(results) == 4
+    assert geocoder.stats()["coalesced"] == 3
+
+
+def test_lookup_many(smarty_client, route):
+    geocoder = ReverseGeocoder(smarty_client)
+    points = [(40.11111, -111.11111), (41.1, -111.1), (40.11112, -111.11113)]
+    results = geocoder.lookup_many(points)
+    assert len(results) == 3
+    assert route.call_count == 2
+
+
+def test_errors_not_cached(smarty_client, respx_mock):
+    respx_mock.get(url__startswith=Client.REVERSE_GEO_URL).mock(
+        return_value=httpx.Response(500)
+    )
+    geocoder = ReverseGeocoder(smarty_client)
+    for _ in range(2):
+        with pytest.raises(exceptions.SmartyStreetsServerError):
+            geocoder.lookup(40.1, -111.1)
+    assert geocoder.stats()["misses"] == 2
+
+
+def test_interrupted_lookup_released(smarty_client, route, mocker):
+    """A lookup ended by a BaseException doesn't leave later lookups of its cell waiting"""
+    geocoder = ReverseGeocoder(smarty_client)
+    mocker.patch.object(smarty_client, "reverse_geocode", side_effect=KeyboardInterrupt)
+    with pytest.raises(KeyboardInterrupt):
+        geocoder.lookup(40.1, -111.1)
+    mocker.stopall()
+
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(geocoder.lookup(40.1, -111.1))
+    )
+    thread.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert len(results[0]) == 1
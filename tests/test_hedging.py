@@ -0,0 +1,125 @@
+"""Tests for hedged requests"""
+
+import concurrent.futures
+import itertools
+import time
+
+import httpx
+import pytest
+
+from smartystreets.client import Client
+from smartystreets.hedging import HedgePolicy
+
+
+def slow_then_fast(delays):
+    """Returns a function which sleeps for the next delay and returns the call number"""
+    counter = itertools.count()
+
+    def func():
+        call = next(counter)
+        time.sleep(delays[call])
+        return call
+
+    return func
+
+
+class TestHedgePolicy:
+    def test_fast_request_not_hedged(self):
+        policy = HedgePolicy(initial_delay=0.5, budget=1)
+        assert policy.call(slow_then_fast([0, 0])) == 0
+        assert policy.stats()["hedges"] == 0
+
+    def test_hedge_wins(self):
+        policy = HedgePolicy(initial_delay=0.01, budget=1)
+        assert policy.call(slow_then_fast([0.5, 0])) == 1
+        stats = policy.stats()
+        assert stats["hedges"] == 1
+        assert stats["wins"] == 1
+        assert stats["win_rate"] == 1.0
+
+    def test_primary_wins(self):
+        policy = HedgePolicy(initial_delay=0.01, budget=1)
+        assert policy.call(slow_then_fast([0.05, 0.5])) == 0
+        assert policy.stats() == {
+            "requests": 1,
+            "hedges": 1,
+            "wins": 0,
+            "hedge_rate": 1.0,
+            "win_rate": 0.0,
+        }
+
+    def test_budget(self):
+        policy = HedgePolicy(initial_delay=0.01, budget=0.5)
+        for _ in range(4):
+            policy.call(slow_then_fast([0.03, 0.03]))
+        assert policy.stats()["hedges"] == 2
+
+    def test_failed_hedge_falls_back_to_primary(self):
+        policy = HedgePolicy(initial_delay=0.01, budget=1)
+        counter = itertools.count()
+
+        def func():
+            if next(counter):
+                raise ValueError
+            time.sleep(0.05)
+            return "primary"
+
+        assert policy.call(func) == "primary"
+
+    def test_both_fail(self):
+        policy = HedgePolicy(initial_delay=0.01, budget=1)
+
+        def func():
+            time.sleep(0.02)
+            raise ValueError
+
+        with pytest.raises(ValueError):
+            policy.call(func)
+
+    def test_busy_workers_not_hedged(self):
+        """Callers beyond the idle workers run inline rather than queueing past the delay"""
+        policy = HedgePolicy(initial_delay=0.2, budget=1, max_workers=4)
+
+        def timed_call():
+            start = time.monotonic()
+            policy.call(time.sleep, 0.1)
+            return time.monotonic() - start
+
+        with concurrent.futures.ThreadPoolExecutor(20) as callers:
+            latencies = list(callers.map(lambda _: timed_call(), range(20)))
+        assert policy.stats()["hedges"] == 0
+        assert max(latencies) < 0.2
+
+    def test_no_idle_worker_for_hedge(self):
+        policy = HedgePolicy(initial_delay=0.01, budget=1, max_workers=1)
+        assert policy.call(slow_then_fast([0.05, 0])) == 0
+        assert policy.stats()["hedges"] == 0
+
+    def test_delay_percentile(self):
+        policy = HedgePolicy(
+            percentile=0.9, initial_delay=1, min_samples=10, min_delay=0
+        )
+        assert policy.delay == 1
+        policy._latencies.extend(i / 100 for i in range(10))
+        assert policy.delay == 0.09
+
+    def test_applies(self):
+        policy = HedgePolicy(max_batch_size=2)
+        assert policy.applies([{}, {}])
+        assert not policy.applies([{}, {}, {}])
+
+
+def test_client_hedging(respx_mock, street_address_url):
+    counter = itertools.count()
+
+    def respond(request):
+        if not next(counter):
+            time.sleep(0.5)
+            return httpx.Response(200, json=[{"street_address": "slow"}])
+        return httpx.Response(200, json=[{"street_address": "fast"}])
+
+    respx_mock.post(street_address_url).mock(side_effect=respond)
+    policy = HedgePolicy(initial_delay=0.05, budget=1)
+    client = Client("blah", "blibbidy", hedging=policy)
+    assert client.street_address("100 Main St")["street_address"] == "fast"
+    assert policy.stats()["wins"] == 1
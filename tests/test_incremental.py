@@ -0,0 +1,107 @@
+"""Tests for incremental re-verification"""
+
+import json
+
+import pytest
+
+from smartystreets.batching import BatchPacker
+from smartystreets.incremental import (
+    IncrementalJob,
+    MemoryFingerprintStore,
+    SQLiteFingerprintStore,
+    fingerprint,
+)
+
+
+def rows(*streets):
+    return [{"input_id": i, "street": street} for i, street in enumerate(streets)]
+
+
+def test_fingerprint_normalization():
+    assert fingerprint({"street": "100  Main St", "input_id": 1}) == fingerprint(
+        {"street": "100 main st", "input_id": 2}
+    )
+    assert fingerprint({"street": "100 Main St"}) != fingerprint(
+        {"street": "100 Main St"}, {"invalid": True}
+    )
+
+
+@pytest.mark.parametrize(
+    "store_class", [MemoryFingerprintStore, SQLiteFingerprintStore]
+)
+def test_store_round_trip(store_class, tmp_path):
+    store = (
+        store_class(str(tmp_path / "fp.db"))
+        if store_class is SQLiteFingerprintStore
+        else store_class()
+    )
+    store.update([(1, "abc", 10.0, [{"delivery_line_1": "100 MAIN ST"}])])
+    assert store.get_many([1, 2]) == {
+        "1": ("abc", 10.0, [{"delivery_line_1": "100 MAIN ST"}])
+    }
+
+
+def test_only_changes_sent(smarty_client, echo_route):
+    store = MemoryFingerprintStore()
+    first = smarty_client.reverify(rows("1 A St", "2 B St", "3 C St"), store)
+    assert len(first) == 3
+    assert json.loads(echo_route.calls.last.request.content)[2]["street"] == "3 C St"
+
+    second = smarty_client.reverify(
+        rows("1 A St", "2 Bee St", "3 C St", "4 D St"), store
+    )
+    sent = json.loads(echo_route.calls.last.request.content)
+    assert [lookup["street"] for lookup in sent] == ["2 Bee St", "4 D St"]
+    assert [address.index for address in second] == [0, 1, 2, 3]
+    assert second.get_index(1)["delivery_line_1"] == "2 BEE ST"
+    assert second.get_index(2)["delivery_line_1"] == "3 C ST"
+    assert second.get_index(3).id == 3
+
+
+def test_stale_rows_resent(smarty_client, echo_route):
+    store = MemoryFingerprintStore()
+    now = [1000.0]
+    job = IncrementalJob(smarty_client, store, max_age=60, clock=lambda: now[0])
+    list(job.run(rows("1 A St", "2 B St")))
+    store.update([(0, store.records["0"][0], 900.0, store.records["0"][2])])
+
+    now[0] = 1030.0
+    list(job.run(rows("1 A St", "2 B St")))
+    assert json.loads(echo_route.calls.last.request.content) == rows("1 A St")
+    assert job.counts == {"new": 2, "changed": 0, "stale": 1, "unchanged": 1}
+
+
+def test_unchanged_snapshot_sends_nothing(smarty_client, echo_route):
+    store = MemoryFingerprintStore()
+    smarty_client.reverify(rows("1 A St"), store)
+    results = smarty_client.reverify(rows("1 A St"), store)
+    assert echo_route.call_count == 1
+    assert results[0]["delivery_line_1"] == "1 A ST"
+
+
+def test_unverified_rows_not_stored(smarty_client, echo_route):
+    """A row which couldn't be sent is verified again by the next job"""
+    store = MemoryFingerprintStore()
+    packer = BatchPacker(max_body_bytes=40)
+    snapshot = rows("1 A St", "2 B St, Anywhere, USA")
+    results = smarty_client.reverify(snapshot, store, packer=packer)
+    assert list(store.records) == ["0"]
+    assert results.unverified == [1]
+    assert [address.index for address in results] == [0]
+
+
+def test_unverified_row_keeps_stored_results(smarty_client, echo_route):
+    """A changed row which couldn't be sent is flagged and served its earlier results"""
+    store = MemoryFingerprintStore()
+    packer = BatchPacker(max_body_bytes=40)
+    smarty_client.reverify(rows("1 A St", "2 B St"), store, packer=packer)
+    results = smarty_client.reverify(
+        rows("1 A St", "2 B St, Anywhere, USA"), store, packer=packer
+    )
+    assert results.unverified == [1]
+    assert results.get_index(1)["delivery_line_1"] == "2 B ST"
+
+
+def test_requires_input_id(smarty_client):
+    with pytest.raises(ValueError):
+        smarty_client.reverify([{"street": "1 A St"}], MemoryFingerprintStore())
@@ -0,0 +1,68 @@
+"""Tests for the process pool pipeline"""
+
+import os
+
+from smartystreets.data import AddressCollection
+from smartystreets.pipeline import Pipeline
+
+
+class FakeClient:
+    """Stands in for Client in worker processes, where HTTP mocks don't reach"""
+
+    def __init__(self, **options):
+        self.options = options
+
+    def bulk_street_addresses(self, addresses):
+        """Lookups marked "skip" are left unverified"""
+        return AddressCollection(
+            [
+                {"input_index": index, "input_id": lookup["input_id"]}
+                for index, lookup in enumerate(addresses)
+                if not lookup.get("skip")
+            ],
+            unverified=[
+                index for index, lookup in enumerate(addresses) if lookup.get("skip")
+            ],
+        )
+
+
+def add_pid(address):
+    address["pid"] = os.getpid()
+    return address
+
+
+def test_results_in_input_order():
+    pipeline = Pipeline(
+        {"auth_id": "blah", "auth_token": "blibbidy"},
+        processes=2,
+        shard_size=7,
+        max_pending=2,
+        client_factory=FakeClient,
+    )
+    addresses = ({"street": "100 Main St", "input_id": str(i)} for i in range(50))
+    results = list(pipeline.run(addresses))
+    assert [address.index for address in results] == list(range(50))
+    assert [address.id for address in results] == [str(i) for i in range(50)]
+
+
+def test_transform_runs_in_workers():
+    pipeline = Pipeline(
+        {}, processes=2, shard_size=5, transform=add_pid, client_factory=FakeClient
+    )
+    results = pipeline.collect({"input_id": str(i)} for i in range(20))
+    assert isinstance(results, AddressCollection)
+    assert results.get_index(19).id == "19"
+    assert os.getpid() not in {address["pid"] for address in results}
+
+
+def test_empty_input():
+    pipeline = Pipeline({}, processes=1, client_factory=FakeClient)
+    assert list(pipeline.run([])) == []
+
+
+def test_unverified_collected():
+    pipeline = Pipeline({}, processes=2, shard_size=4, client_factory=FakeClient)
+    addresses = [{"input_id": str(i), "skip": i % 5 == 0} for i in range(12)]
+    results = pipeline.collect(addresses)
+    assert results.unverified == [0, 5, 10]
+    assert len(results) == 9
@@ -0,0 +1,182 @@
+"""Tests for the priority lane scheduler"""
+
+import threading
+import time
+
+import httpx
+import pytest
+
+from smartystreets.client import Client
+from smartystreets.scheduling import BULK, INTERACTIVE, LaneScheduler
+
+
+def wait_for_depth(scheduler, lane, depth):
+    for _ in range(200):
+        if scheduler.stats()[lane]["depth"] == depth:
+            return
+        time.sleep(0.005)
+    raise AssertionError(f"{lane} lane never reached depth {depth}")
+
+
+def queue(scheduler, lane, order, name):
+    def run():
+        with scheduler.slot(lane):
+            order.append(name)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_weighted_fair_order():
+    scheduler = LaneScheduler(slots=2, reserved=1)
+    scheduler.acquire(INTERACTIVE)
+    scheduler.acquire(INTERACTIVE)
+    order = []
+    threads = []
+    for i in range(3):
+        threads.append(queue(scheduler, BULK, order, f"b{i}"))
+        wait_for_depth(scheduler, BULK, i + 1)
+    for i in range(3):
+        threads.append(queue(scheduler, INTERACTIVE, order, f"i{i}"))
+        wait_for_depth(scheduler, INTERACTIVE, i + 1)
+
+    scheduler.release()
+    scheduler.release()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    # Interactive lookups queued after the bulk batches still go ahead of most of them
+    assert order.index("i2") < order.index("b1")
+    assert sorted(order) == ["b0", "b1", "b2", "i0", "i1", "i2"]
+    stats = scheduler.stats()
+    assert stats[BULK]["max_depth"] == 3
+    assert stats[INTERACTIVE]["granted"] == 5
+    assert stats[BULK]["max_wait"] > 0
+
+
+def test_reserved_slots():
+    scheduler = LaneScheduler(slots=2, reserved=1)
+    scheduler.acquire(BULK)
+    order = []
+    thread = queue(scheduler, BULK, order, "bulk")
+    wait_for_depth(scheduler, BULK, 1)
+
+    # The reserved slot is still free for an interactive lookup
+    scheduler.acquire(INTERACTIVE)
+    assert scheduler.stats()[BULK]["depth"] == 1
+    scheduler.release()
+    scheduler.release()
+    thread.join(timeout=5)
+    assert order == ["bulk"]
+
+
+def test_rate_limit():
+    scheduler = LaneScheduler(slots=10, rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(3):
+        with scheduler.slot(INTERACTIVE):
+            pass
+    assert time.monotonic() - start >= 0.035
+
+
+def test_acquire_timeout():
+    scheduler = LaneScheduler(slots=2, reserved=1)
+    scheduler.acquire(BULK)
+    start = time.monotonic()
+    with pytest.raises(httpx.PoolTimeout):
+        scheduler.acquire(BULK, timeout=0.05)
+    assert time.monotonic() - start < 1
+    assert scheduler.stats()[BULK]["depth"] == 0
+    scheduler.release()
+    with scheduler.slot(BULK, timeout=0.05):
+        assert scheduler.in_use == 1
+
+
+def test_partial_weights():
+    """Lanes missing from the weights given keep their default weight"""
+    scheduler = LaneScheduler(weights={INTERACTIVE: 4})
+    assert scheduler.lanes[INTERACTIVE].weight == 4
+    assert scheduler.lanes[BULK].weight == 1
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        LaneScheduler(slots=1, reserved=1)
+    with pytest.raises(ValueError):
+        LaneScheduler().acquire("nightly")
+
+
+def test_client_lanes(respx_mock, street_address_url):
+    respx_mock.post(street_address_url).mock(return_value=httpx.Response(200, json=[]))
+    scheduler = LaneScheduler()
+    client = Client("blah", "blibbidy", scheduler=scheduler)
+    client.street_address("100 Main St")
+    client.bulk_street_addresses(["100 Main St", "200 Main St"])
+    stats = scheduler.stats()
+    assert stats[INTERACTIVE]["granted"] == 1
+    assert stats[BULK]["granted"] == 1
+    assert scheduler.in_use == 0
+
+
+def test_client_partial_weights(respx_mock, street_address_url):
+    respx_mock.post(street_address_url).mock(return_value=httpx.Response(200, json=[]))
+    scheduler = LaneScheduler(weights={INTERACTIVE: 4})
+    client = Client("blah", "blibbidy", scheduler=scheduler)
+    client.bulk_street_addresses(["100 Main St"])
+    assert scheduler.stats()[BULK]["granted"] == 1
+
+
+def test_client_deadline_bounds_slot_wait(respx_mock):
+    """Waiting for a slot doesn't outlast a bulk call's deadline"""
+    respx_mock.post(url__startswith=Client.BASE_URL).mock(
+        return_value=httpx.Response(200, json=[])
+    )
+    scheduler = LaneScheduler(slots=2, reserved=1)
+    client = Client("blah", "blibbidy", scheduler=scheduler)
+    scheduler.acquire(BULK)
+    try:
+        start = time.monotonic()
+        response = client.bulk_street_addresses(["100 Main St"], deadline=0.1)
+        assert time.monotonic() - start < 0.5
+        assert response.unverified == [0]
+    finally:
+        scheduler.release()
+
+
+def test_client_slot_wait_shortens_timeout(respx_mock):
+    """The time left after waiting for a slot bounds the request's timeout"""
+    timeouts = []
+
+    def respond(request):
+        timeouts.append(request.extensions["timeout"]["read"])
+        return httpx.Response(200, json=[])
+
+    respx_mock.post(url__startswith=Client.BASE_URL).mock(side_effect=respond)
+    scheduler = LaneScheduler(slots=2, reserved=1)
+    client = Client("blah", "blibbidy", scheduler=scheduler)
+    scheduler.acquire(BULK)
+    threading.Timer(0.25, scheduler.release).start()
+    response = client.bulk_street_addresses(["100 Main St"], deadline=0.4)
+    assert response.unverified == []
+    assert timeouts[0] <= 0.16
+
+
+def test_client_deadline_passes_during_slot_wait(respx_mock, monkeypatch):
+    """A request admitted with no time left before the deadline isn't sent"""
+    route = respx_mock.post(url__startswith=Client.BASE_URL).mock(
+        return_value=httpx.Response(200, json=[])
+    )
+    scheduler = LaneScheduler()
+    client = Client("blah", "blibbidy", scheduler=scheduler)
+    acquire = scheduler.acquire
+
+    def slow_acquire(lane, timeout=None):
+        acquire(lane, timeout)
+        time.sleep(timeout + 0.01)
+
+    monkeypatch.setattr(scheduler, "acquire", slow_acquire)
+    response = client.bulk_street_addresses(["100 Main St"], deadline=0.05)
+    assert response.unverified == [0]
+    assert not route.called
+    assert scheduler.in_use == 0
@@ -0,0 +1,138 @@
+"""Tests for compact binary serialization"""
+
+import io
+import json
+import pickle
+
+import pytest
+
+from smartystreets import serialization
+from smartystreets.data import Address, AddressCollection
+
+RESULT = {
+    "input_id": "row-17",
+    "input_index": 0,
+    "candidate_index": 0,
+    "delivery_line_1": "1600 Amphitheatre Pkwy",
+    "last_line": "Mountain View CA 94043-1351",
+    "delivery_point_barcode": "940431351000",
+    "components": {
+        "primary_number": "1600",
+        "street_name": "Amphitheatre",
+        "street_suffix": "Pkwy",
+        "city_name": "Mountain View",
+        "state_abbreviation": "CA",
+        "zipcode": "94043",
+        "plus4_code": "1351",
+        "delivery_point": "00",
+        "delivery_point_check_digit": "0",
+    },
+    "metadata": {
+        "record_type": "S",
+        "zip_type": "Standard",
+        "county_fips": "06085",
+        "county_name": "Santa Clara",
+        "carrier_route": "C909",
+        "congressional_district": "18",
+        "rdi": "Commercial",
+        "elot_sequence": "0103",
+        "elot_sort": "A",
+        "latitude": 37.42357,
+        "longitude": -122.08661,
+        "precision": "Zip9",
+        "time_zone": "Pacific",
+        "utc_offset": -8,
+        "dst": True,
+    },
+    "analysis": {
+        "dpv_match_code": "Y",
+        "dpv_footnotes": "AABB",
+        "dpv_cmra": "N",
+        "dpv_vacant": "N",
+        "active": "Y",
+    },
+}
+
+backends = pytest.mark.parametrize(
+    "backend",
+    [
+        serialization.STDLIB,
+        pytest.param(
+            serialization.MSGPACK,
+            marks=pytest.mark.skipif(
+                serialization.msgpack is None, reason="msgpack is not installed"
+            ),
+        ),
+    ],
+)
+
+
+@backends
+def test_address_round_trip(backend):
+    address = Address(RESULT)
+    loaded = serialization.loads(serialization.dumps(address, backend=backend))
+    assert isinstance(loaded, Address)
+    assert loaded == RESULT
+
+
+@backends
+def test_collection_round_trip(backend):
+    collection = AddressCollection([RESULT, dict(RESULT, input_id="row-18")])
+    loaded = serialization.loads(serialization.dumps(collection, backend=backend))
+    assert isinstance(loaded, AddressCollection)
+    assert loaded == collection
+    assert loaded.get("row-18") == collection[1]
+
+
+@backends
+def test_collection_unverified_round_trip(backend):
+    collection = AddressCollection([RESULT], unverified=[1, 2])
+    loaded = serialization.loads(serialization.dumps(collection, backend=backend))
+    assert loaded.unverified == [1, 2]
+
+
+@backends
+def test_arbitrary_values(backend):
+    value = {
+        "unknown_key": ["Y", "Yes", "", "\u00e9t\u00e9 \U0001f3e0"],
+        "numbers": [0, -1, 2**40, -(2**63), 0.5, -1e300],
+        "flags": [None, True, False],
+        "nested": {"state": "VA", "street": {"S": "Standard"}},
+    }
+    assert serialization.loads(serialization.dumps(value, backend=backend)) == value
+
+
+@backends
+def test_stream_round_trip(backend):
+    addresses = [dict(RESULT, input_index=index) for index in range(50)]
+    fp = io.BytesIO()
+    assert serialization.dump_stream(addresses, fp, backend=backend) == 50
+    fp.seek(0)
+    loaded = list(serialization.load_stream(fp))
+    assert loaded == addresses
+    assert all(isinstance(address, Address) for address in loaded)
+
+
+@backends
+def test_non_string_keys(backend):
+    with pytest.raises(TypeError):
+        serialization.dumps({1: "a"}, backend=backend)
+
+
+def test_not_serialized_data():
+    with pytest.raises(ValueError):
+        serialization.loads(b"not serialized")
+
+
+@backends
+def test_smaller_than_json_and_pickle(backend):
+    # Distinct records, as pickle would otherwise only store one shared dictionary
+    collection = AddressCollection(
+        [
+            json.loads(json.dumps(dict(RESULT, input_index=index)))
+            for index in range(100)
+        ]
+    )
+    size = len(serialization.dumps(collection, backend=backend))
+    assert size < len(json.dumps(collection).encode("utf-8")) / 2
+    assert size < len(pickle.dumps(collection, protocol=pickle.HIGHEST_PROTOCOL)) / 2
@@ -0,0 +1,139 @@
+"""Tests for the on-disk result store"""
+
+import pytest
+
+from smartystreets import serialization
+from smartystreets import store as store_module
+from smartystreets.data import Address
+from smartystreets.store import ResultStore
+
+
+def results(count, start=0):
+    return [
+        {"input_index": i, "input_id": f"id-{i}", "delivery_line_1": f"{i} Main St"}
+        for i in range(start, start + count)
+    ]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "results.bin")
+
+
+@pytest.mark.parametrize(
+    "backend",
+    [
+        serialization.STDLIB,
+        pytest.param(
+            serialization.MSGPACK,
+            marks=pytest.mark.skipif(
+                serialization.msgpack is None, reason="msgpack is not installed"
+            ),
+        ),
+    ],
+)
+def test_round_trip(path, backend):
+    with ResultStore(path, "w", backend=backend) as store:
+        store.extend(results(50))
+
+    store = ResultStore(path)
+    assert len(store) == 50
+    assert list(store) == results(50)
+    assert isinstance(store[-1], Address)
+    assert store[10]["delivery_line_1"] == "10 Main St"
+    assert store.get("id-42").index == 42
+    assert store.get_index(17).id == "id-17"
+    store.close()
+
+
+def test_missing_keys(path):
+    with ResultStore(path, "w") as store:
+        store.extend(results(3))
+        store.append({"delivery_line_1": "no index or id"})
+
+    store = ResultStore(path)
+    assert len(store) == 4
+    with pytest.raises(KeyError):
+        store.get("id-9")
+    with pytest.raises(KeyError):
+        store.get_index(9)
+    with pytest.raises(KeyError):
+        store.get_index("id-1")
+    with pytest.raises(IndexError):
+        store[4]
+
+
+@pytest.mark.parametrize("sort_run", [2, store_module.SORT_RUN])
+def test_out_of_order_and_duplicates(path, monkeypatch, sort_run):
+    """Matches AddressCollection, where the last result for an input wins"""
+    monkeypatch.setattr(store_module, "SORT_RUN", sort_run)
+    records = (
+        results(5, start=5) + results(5) + [dict(results(1)[0], candidate_index=1)]
+    )
+    with ResultStore(path, "w") as store:
+        store.extend(records)
+
+    store = ResultStore(path)
+    assert store.get_index(0)["candidate_index"] == 1
+    assert store.get("id-0")["candidate_index"] == 1
+    assert store.get_index(7).id == "id-7"
+    assert store.get("id-3").index == 3
+
+
+def test_read_while_writing(path):
+    store = ResultStore(path, "w")
+    store.extend(results(3))
+    assert store.get_index(2).id == "id-2"
+    store.extend(results(3, start=3))
+    assert store.get("id-5").index == 5
+    assert len(store) == 6
+    store.close()
+    with pytest.raises(ValueError):
+        ResultStore(path).append({})
+
+
+def test_unverified_persisted(path):
+    with ResultStore(path, "w") as store:
+        store.extend(results(2))
+        store.unverified = [2, 5]
+
+    store = ResultStore(path)
+    assert store.unverified == [2, 5]
+    store.close()
+
+    # Rewriting the store doesn't keep the old store's unverified indexes
+    ResultStore(path, "w").close()
+    assert ResultStore(path).unverified == []
+
+
+def test_bulk_into_store(path, smarty_client, echo_route):
+    with ResultStore(path, "w") as store:
+        returned = smarty_client.bulk_street_addresses(
+            ({"street": "100 Main St", "input_id": str(i)} for i in range(250)),
+            store=store,
+        )
+        assert returned is store
+        assert returned.unverified == []
+
+    store = ResultStore(path)
+    assert len(store) == 250
+    assert store.get_index(249).id == "249"
+    assert store.get("120").index == 120
+
+
+def test_lookups_sorted_across_runs(path, monkeypatch):
+    monkeypatch.setattr(store_module, "SORT_RUN", 3)
+    indexes = [7, 3, 9, 3, 0, 7, 1, 8, 3, 5]
+    with ResultStore(path, "w") as store:
+        store.extend(
+            {"input_index": index, "input_id": f"id-{index}", "order": order}
+            for order, index in enumerate(indexes)
+        )
+
+    with open(f"{path}.byindex", "rb") as fp:
+        lookups = list(store_module.LOOKUP.iter_unpack(fp.read()))
+    assert lookups == sorted((index, order) for order, index in enumerate(indexes))
+    store = ResultStore(path)
+    assert store.get_index(3)["order"] == 8
+    assert store.get("id-7")["order"] == 5
+    store.close()